@@ -1,5 +1,8 @@
+import time
+STARTUP_T0 = time.perf_counter()          # ishga tushish hisoboti uchun
 import aiohttp
-import asyncio, math, re, os, requests,asyncpg
+import asyncio, json, math, re, os, secrets, asyncpg
+import numpy as np
 import sys
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.enums import ParseMode
@@ -11,7 +14,6 @@ from aiogram.types import (
     InlineKeyboardMarkup, InlineKeyboardButton
 )
 from geopy.geocoders import Nominatim
-import spacy
 from aiogram.filters import BaseFilter
 
 from dotenv import load_dotenv
@@ -26,6 +28,126 @@ BOT_TOKEN  = os.getenv("BOT_TOKEN")
 CHANNEL_ID = int(os.getenv("CHANNEL_ID"))
 ADMIN_ID   = set(int(i.strip()) for i in os.getenv("ADMIN_ID").split(","))
 
+# Ishga tushirish rejimi: "polling" yoki "webhook"
+BOT_MODE         = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL      = os.getenv("WEBHOOK_URL", "")          # tashqi manzil, masalan https://bot.example.com
+WEBHOOK_PATH     = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST     = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT     = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET   = os.getenv("WEBHOOK_SECRET") or None
+WEB_WORKERS      = int(os.getenv("WEB_WORKERS", "1"))    # webhook worker protsesslari soni
+BOT_WORKER       = os.getenv("BOT_WORKER")               # worker protsessi ichida: uning raqami
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")         # boshqa Bot API server (masalan, lokal soxta server)
+
+
+
+# ---------- tashqi HTTP qatlami ----------
+import contextlib, time
+from collections import deque
+from geopy.adapters import AioHTTPAdapter
+
+# provayder → so'rov timeouti (s)
+PROVIDER_TIMEOUTS = {"nominatim": 10, "google": 10, "photon": 10, "links": 15, "webhook": 10}
+
+
+class ProviderStats:
+    """Provayder bo'yicha so'rovlar, xatolar, muvaffaqiyatlar va oxirgi kechikishlar (ms)"""
+    __slots__ = ("calls", "errors", "hits", "latencies")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.hits = 0
+        self.latencies = deque(maxlen=200)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        data = sorted(self.latencies)
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+
+class HttpLayer:
+    """
+    Barcha tashqi so'rovlar uchun bitta aiohttp sessiyasi: keep-alive pul,
+    host bo'yicha ulanish limiti, DNS kesh va provayder metrikalari.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 8, dns_ttl: int = 300):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self._session: aiohttp.ClientSession | None = None
+        self.stats: dict[str, ProviderStats] = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=60,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trust_env=False)
+        return self._session
+
+    async def start(self):
+        self.session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def timeout(self, provider: str) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=PROVIDER_TIMEOUTS.get(provider, 15))
+
+    @contextlib.asynccontextmanager
+    async def track(self, provider: str):
+        """
+        Blok davomiyligini provayder metrikasiga yozadi. Bekor qilingan so'rov (hedge'da
+        yutqazgan) p90 dan uzoq davom etgan bo'lsa, davomiyligi quyi chegara sifatida
+        yoziladi – aks holda p90 faqat tez javoblarni ko'rib, pasayib boradi.
+        """
+        st = self.stats.setdefault(provider, ProviderStats())
+        st.calls += 1
+        t0 = time.perf_counter()
+        try:
+            yield st
+        except asyncio.CancelledError:
+            st.calls -= 1
+            elapsed = (time.perf_counter() - t0) * 1000
+            p90 = st.percentile(0.9)
+            if p90 is None or elapsed >= p90:
+                st.latencies.append(elapsed)
+            raise
+        except Exception:
+            st.errors += 1
+            st.latencies.append((time.perf_counter() - t0) * 1000)
+            raise
+        st.latencies.append((time.perf_counter() - t0) * 1000)
+
+    @contextlib.asynccontextmanager
+    async def get(self, provider: str, url: str, **kwargs):
+        kwargs.setdefault("timeout", self.timeout(provider))
+        async with self.track(provider):
+            async with self.session.get(url, **kwargs) as resp:
+                yield resp
+
+
+HTTP = HttpLayer()
+
+
+class SharedAioHTTPAdapter(AioHTTPAdapter):
+    """geopy so'rovlari HTTP qatlamining umumiy sessiyasi orqali"""
+
+    @property
+    def session(self):
+        return HTTP.session
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass                               # sessiyani HTTP.close() yopadi
 
 
 # ---------- geocoderlar ----------
@@ -34,8 +156,10 @@ from geopy.exc import GeocoderUnavailable, GeocoderTimedOut
 import asyncio, random
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")          # opsional
-geolocator_nom = Nominatim(user_agent="halal_bot_ua") # user-agent ahamiyatli
-geolocator_goo = GoogleV3(api_key=GOOGLE_API_KEY) if GOOGLE_API_KEY else None
+geolocator_nom = Nominatim(user_agent="halal_bot_ua",  # user-agent ahamiyatli
+                           adapter_factory=SharedAioHTTPAdapter)
+geolocator_goo = GoogleV3(api_key=GOOGLE_API_KEY,
+                          adapter_factory=SharedAioHTTPAdapter) if GOOGLE_API_KEY else None
 
 class BlacklistWord(StatesGroup):
     waiting_word = State()
@@ -59,61 +183,318 @@ def detect_lang(text: str) -> str:
     return "ru" if cyr / max(1, cyr + lat) >= 0.30 else "en"
 
 
-async def geocode_with_retry(query: str, timeout: int = 30):
+# ---------- kesh (LRU + TTL) ----------
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """Jarayon ichidagi LRU kesh: hajm va TTL bo'yicha eskiradi"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (tugash vaqti, qiymat)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def keys(self):
+        return list(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ---------- geocode kesh ----------
+GEO_TTL = 30 * 24 * 3600        # topilgan koordinatalar 30 kun saqlanadi
+GEO_NEG_TTL = 6 * 3600          # topilmagan so'rovlar (negativ kesh) 6 soat
+geo_cache = TTLCache(maxsize=5000, ttl=GEO_TTL)
+GEO_CACHE_STATS = {"hit": 0, "db_hit": 0, "miss": 0, "negative": 0, "coalesced": 0, "failed": 0}
+_geo_inflight: dict[str, asyncio.Future] = {}
+
+
+def report_stats(title: str, stats: dict):
+    """Hisoblagichlarni bir qatorda chiqaradi (to'xtashda)"""
+    print(f"{title}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+# ---------- geocoder limitlari ----------
+class TokenBucket:
+    """Jarayon bo'yicha umumiy token-bucket: soniyasiga rate ta, capacity gacha jamlanadi"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._stamp = time.monotonic()
+        self._lock = asyncio.Lock()      # navbat FIFO tartibida
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Nominatim siyosati: butun jarayon bo'yicha 1 so'rov/s
+GEO_LIMITS = {
+    "nominatim": TokenBucket(rate=1.0, capacity=1),
+    "google": TokenBucket(rate=25.0, capacity=25),
+    "photon": TokenBucket(rate=2.0, capacity=2),
+}
+
+
+class GeoUnavailable(Exception):
+    """Provayder javob bermadi (tarmoq, kvota, 5xx) – bu «topilmadi» emas, keshlanmaydi"""
+
+
+def geo_cache_key(query: str) -> str:
+    """«Chicago, IL » va «chicago il» bitta kalitga tushadi"""
+    t = re.sub(r"[^\w\s]", " ", query.casefold())
+    return re.sub(r"\s+", " ", t).strip()
+
+
+async def geocode_with_retry(query: str, timeout: int | None = None):
     """
-    1) Nominatim (1 s kutib)
-    2) Agar Google API bor bo‘lsa → Google
-    3) Agar Photon (open) kerak bo‘lsa → https://photon.komoot.io
-    Har biriga 3 urinish, timeout 30 s
+    Avval xotira (LRU), keyin PostgreSQL keshi, so'ng geocoderlar.
+    Topilmagan so'rovlar ham (None, None) ko'rinishida qisqa muddat keshlanadi.
     """
     query = query.strip()
     if not query:
         return None, None
 
-    # 1) Nominatim
+    key = geo_cache_key(query)
+    cached = geo_cache.get(key, _MISSING)
+    if cached is not _MISSING:
+        GEO_CACHE_STATS["hit"] += 1
+        return cached
+
+    # single-flight: bir xil so'rovlar bitta upstream chaqiruvni kutadi
+    task = _geo_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_geocode_fill(key, query, timeout))
+        _geo_inflight[key] = task
+        task.add_done_callback(lambda _: _geo_inflight.pop(key, None))
+    else:
+        GEO_CACHE_STATS["coalesced"] += 1
+    return await asyncio.shield(task)
+
+
+async def _geocode_fill(key: str, query: str, timeout: int | None):
+    """Kesh topilmaganda: PostgreSQL keshi, keyin geocoderlar"""
+    row = await geo_cache_db_get(key)
+    if row is not None:
+        coords, ttl = row
+        GEO_CACHE_STATS["db_hit"] += 1
+        geo_cache.set(key, coords, ttl=ttl)
+        return coords
+
+    GEO_CACHE_STATS["miss"] += 1
+    try:
+        coords = await geocode_upstream(query, timeout)
+    except GeoUnavailable as e:
+        GEO_CACHE_STATS["failed"] += 1
+        print(f"Geocoding ({query}) xatosi: {e}")
+        return None, None
+    if coords[0] is None:
+        GEO_CACHE_STATS["negative"] += 1
+        ttl = GEO_NEG_TTL
+    else:
+        ttl = GEO_TTL
+    geo_cache.set(key, coords, ttl=ttl)
+    await geo_cache_db_put(key, coords, ttl)
+    return coords
+
+
+def _geo_hit(provider: str, lat: float, lng: float):
+    HTTP.stats.setdefault(provider, ProviderStats()).hits += 1
+    return lat, lng
+
+
+async def geo_nominatim(query: str, timeout: int | None = None):
+    """Nominatim (GEO_LIMITS bo'yicha navbat bilan); faqat tarmoq xatosida qayta urinadi"""
+    error = None
     for _ in range(3):
         try:
-            await asyncio.sleep(1.1)
-            geo = await asyncio.to_thread(
-                geolocator_nom.geocode,
-                query,
-                language="en",
-                timeout=timeout,
-                exactly_one=True
-            )
+            await GEO_LIMITS["nominatim"].acquire()
+            async with HTTP.track("nominatim"):
+                geo = await geolocator_nom.geocode(
+                    query,
+                    language="en",
+                    country_codes="us",
+                    timeout=timeout or PROVIDER_TIMEOUTS["nominatim"],
+                    exactly_one=True
+                )
             if geo and "united states" in geo.address.lower():
-                return geo.latitude, geo.longitude
-        except (GeocoderUnavailable, GeocoderTimedOut):
-            continue                      # ← 1) bu yerdagi "if geo and" olib tashlandi
+                return _geo_hit("nominatim", geo.latitude, geo.longitude)
+            return None                   # javob keldi, lekin AQSh emas – qayta so'ramaymiz
+        except (GeocoderUnavailable, GeocoderTimedOut) as e:
+            error = e
+        except Exception as e:
+            raise GeoUnavailable(f"nominatim: {e}") from e
+    raise GeoUnavailable(f"nominatim: {error}")
 
-    # 2) Google (agar kalit bor bo‘lsa)
-    if geolocator_goo:
-        for _ in range(3):
-            try:
-                geo = await asyncio.to_thread(
-                    geolocator_goo.geocode,
+
+def google_country(raw: dict) -> str | None:
+    for comp in raw.get("address_components", []):
+        if "country" in comp.get("types", []):
+            return comp.get("short_name")
+    return None
+
+
+async def geo_google(query: str, timeout: int | None = None):
+    """Google Geocoding (faqat GOOGLE_API_KEY bo'lsa)"""
+    error = None
+    for _ in range(3):
+        try:
+            await GEO_LIMITS["google"].acquire()
+            async with HTTP.track("google"):
+                geo = await geolocator_goo.geocode(
                     query,
-                    timeout=timeout
+                    components={"country": "US"},
+                    timeout=timeout or PROVIDER_TIMEOUTS["google"]
                 )
-                if geo:
-                    return geo.latitude, geo.longitude
-            except Exception:
-                continue
+            if geo and google_country(geo.raw) == "US":
+                return _geo_hit("google", geo.latitude, geo.longitude)
+            return None                   # topilmadi yoki AQSh emas
+        except Exception as e:
+            error = e
+    raise GeoUnavailable(f"google: {error}")
 
-    # 3) Photon (ochiq, tezkor, registratsiyasiz)
+
+async def geo_photon(query: str, timeout: int | None = None):
+    """Photon (ochiq, tezkor, registratsiyasiz) – https://photon.komoot.io"""
+    url = "https://photon.komoot.io/api"
+    params = {"q": query, "limit": 5}
+    await GEO_LIMITS["photon"].acquire()
+    kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
     try:
-        url = "https://photon.komoot.io/api"   # ← 2) oxiridagi probel olib tashlandi
-        params = {"q": query, "limit": 1}
-        async with aiohttp.ClientSession() as ses:
-            async with ses.get(url, params=params, timeout=timeout) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data["features"]:
-                        lon, lat = data["features"][0]["geometry"]["coordinates"]
-                        return lat, lon
-    except Exception:
-        pass
+        async with HTTP.get("photon", url, params=params, **kwargs) as resp:
+            if resp.status != 200:
+                raise GeoUnavailable(f"photon: HTTP {resp.status}")
+            data = await resp.json()
+    except GeoUnavailable:
+        raise
+    except Exception as e:
+        raise GeoUnavailable(f"photon: {e}") from e
+    for feature in data.get("features", []):
+        # faqat AQSh natijasi – chet eldagi bir xil nom poygada yutmasligi kerak
+        if feature.get("properties", {}).get("countrycode", "").upper() == "US":
+            lon, lat = feature["geometry"]["coordinates"]
+            return _geo_hit("photon", lat, lon)
+    return None
+
+
+def geo_providers():
+    """Ustuvorlik tartibida: Nominatim → Google (kalit bo'lsa) → Photon"""
+    providers = [("nominatim", geo_nominatim)]
+    if geolocator_goo:
+        providers.append(("google", geo_google))
+    providers.append(("photon", geo_photon))
+    return providers
+
+
+# ---------- hedged geocoding ----------
+GEO_HEDGE = os.getenv("GEO_HEDGE", "1") != "0"
+GEO_HEDGE_DELAY = float(os.getenv("GEO_HEDGE_DELAY_MS", "800")) / 1000   # statistika yetarli bo'lguncha
+GEO_HEDGE_MIN, GEO_HEDGE_MAX = 0.2, 3.0
+GEO_HEDGE_SAMPLES = 20
+
 
+def hedge_delay(provider: str) -> float:
+    """Keyingi provayderni ishga tushirishdan oldingi kutish: oldingisining p90 kechikishi"""
+    st = HTTP.stats.get(provider)
+    if st is None or len(st.latencies) < GEO_HEDGE_SAMPLES:
+        return GEO_HEDGE_DELAY
+    p90 = st.percentile(0.9) / 1000
+    return min(GEO_HEDGE_MAX, max(GEO_HEDGE_MIN, p90))
+
+
+async def geocode_hedged(query: str, timeout: int | None = None):
+    """
+    Provayderlar navbat bilan, lekin kutmasdan: birinchisi hedge_delay ichida javob
+    bermasa (yoki bo'sh qaytsa) keyingisi ham ishga tushadi. Birinchi yaroqli AQSh
+    natijasi qaytadi, qolganlari bekor qilinadi. Hech kim topmagan va kamida bittasi
+    xato bergan bo'lsa – GeoUnavailable (javob noma'lum, keshlanmaydi).
+    """
+    providers = geo_providers()
+    pending: set[asyncio.Task] = set()
+    error = None
+    try:
+        for i, (name, fn) in enumerate(providers):
+            pending.add(asyncio.create_task(fn(query, timeout)))
+            last = i == len(providers) - 1
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=None if last else hedge_delay(name),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif task.result():
+                        return task.result()
+                if not last:
+                    break                 # kechikdi yoki bo'sh qaytdi → keyingi provayder
+    finally:
+        for task in pending:
+            task.cancel()
+    if error is not None:
+        raise error if isinstance(error, GeoUnavailable) else GeoUnavailable(str(error))
+    return None, None
+
+
+async def geocode_upstream(query: str, timeout: int | None = None):
+    """
+    1) Nominatim  2) Google (kalit bo'lsa)  3) Photon.
+    GEO_HEDGE=1 bo'lsa parallel (hedged), aks holda ketma-ket.
+    Hech biri topmasa va xato bo'lgan bo'lsa – GeoUnavailable.
+    """
+    if GEO_HEDGE:
+        return await geocode_hedged(query, timeout)
+    error = None
+    for _, fn in geo_providers():
+        try:
+            coords = await fn(query, timeout)
+        except GeoUnavailable as e:
+            error = e
+            continue
+        if coords:
+            return coords
+    if error is not None:
+        raise error
     return None, None
 
 
@@ -122,37 +503,145 @@ DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:EuYdfdXvtJFcPxWl
 
 # Global pool
 db_pool = None
+# pool ulanishlarining application_name – NOTIFY xabarlarida o'z yozuvlarimizni ajratish uchun
+PROCESS_TAG = f"myhalal-{os.getpid()}-{secrets.token_hex(4)}"
+# pg_advisory_xact_lock kalitlari (sxema va boshlang'ich katalog bir marta)
+DB_LOCK_SCHEMA = 7_401_001
+DB_LOCK_SEED = 7_401_002
 
 async def init_db():
     """PostgreSQL ulanish poolini yaratish va jadvallarni tekshirish"""
     global db_pool
-    db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10)
+    db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10,
+                                        server_settings={"application_name": PROCESS_TAG})
     
     async with db_pool.acquire() as conn:
-        # Places jadvali
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS places (
-                id SERIAL PRIMARY KEY,
-                name TEXT NOT NULL,
-                lat DOUBLE PRECISION NOT NULL,
-                lng DOUBLE PRECISION NOT NULL,
-                text_user TEXT NOT NULL,
-                text_channel TEXT NOT NULL
-            )
-        """)
+        # Bir nechta worker/replika bir vaqtda ishga tushganda sxema bir marta yangilanadi
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", DB_LOCK_SCHEMA)
+
+            # Places jadvali
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS places (
+                    id SERIAL PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    lat DOUBLE PRECISION NOT NULL,
+                    lng DOUBLE PRECISION NOT NULL,
+                    text_user TEXT NOT NULL,
+                    text_channel TEXT NOT NULL
+                )
+            """)
         
-        # Blacklist jadvali
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS blacklist (
-                word TEXT PRIMARY KEY
-            )
-        """)
+            # Blacklist jadvali
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS blacklist (
+                    word TEXT PRIMARY KEY
+                )
+            """)
         
-        # Indexlar
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_places_name ON places(name);
-            CREATE INDEX IF NOT EXISTS idx_places_coords ON places(lat, lng);
-        """)
+            # FSM holati (bo'sh holat va ma'lumotli qatorlar saqlanmaydi)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS fsm_state (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data JSONB NOT NULL DEFAULT '{}',
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_fsm_state_updated ON fsm_state(updated_at);
+            """)
+
+            # Geocode keshi (lat NULL → topilmagan)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    query TEXT PRIMARY KEY,
+                    lat DOUBLE PRECISION,
+                    lng DOUBLE PRECISION,
+                    expires_at TIMESTAMPTZ NOT NULL
+                )
+            """)
+
+            # AI (ai_extract_city) javoblari keshi, "" → EMPTY
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_city_cache (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    expires_at TIMESTAMPTZ NOT NULL
+                )
+            """)
+
+            # Qisqa havola → to'liq havola (goo.gl redirectlari o'zgarmaydi)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS short_links (
+                    short_url TEXT PRIMARY KEY,
+                    expanded_url TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+
+            # Tuzilmali maydonlar (text_user/text_channel shulardan yasaladi)
+            await conn.execute("""
+                ALTER TABLE places
+                    ADD COLUMN IF NOT EXISTS number TEXT,
+                    ADD COLUMN IF NOT EXISTS title TEXT,
+                    ADD COLUMN IF NOT EXISTS city TEXT,
+                    ADD COLUMN IF NOT EXISTS map_link TEXT,
+                    ADD COLUMN IF NOT EXISTS details TEXT,
+                    ADD COLUMN IF NOT EXISTS menu_num TEXT,
+                    ADD COLUMN IF NOT EXISTS menu_note TEXT,
+                    ADD COLUMN IF NOT EXISTS phones TEXT,
+                    ADD COLUMN IF NOT EXISTS telegram TEXT,
+                    ADD COLUMN IF NOT EXISTS extra TEXT,
+                    ADD COLUMN IF NOT EXISTS structured BOOLEAN NOT NULL DEFAULT FALSE
+            """)
+            await migrate_places(conn)
+
+            # O'zgarishlar haqida boshqa replikalarga xabar (LISTEN/NOTIFY)
+            await conn.execute("""
+                -- xabar muallifi: yozgan ulanishning application_name (har bir protsessda noyob)
+                CREATE OR REPLACE FUNCTION notify_origin() RETURNS text AS $$
+                    SELECT replace(current_setting('application_name'), ':', '_')
+                $$ LANGUAGE sql STABLE;
+
+                CREATE OR REPLACE FUNCTION notify_places() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        PERFORM pg_notify('places_changed', notify_origin() || ':' || TG_OP || ':' || OLD.id);
+                    ELSE
+                        PERFORM pg_notify('places_changed', notify_origin() || ':' || TG_OP || ':' || NEW.id);
+                    END IF;
+                    RETURN NULL;
+                END $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION notify_blacklist() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        PERFORM pg_notify('blacklist_changed', notify_origin() || ':' || TG_OP || ':' || OLD.word);
+                    ELSE
+                        PERFORM pg_notify('blacklist_changed', notify_origin() || ':' || TG_OP || ':' || NEW.word);
+                    END IF;
+                    RETURN NULL;
+                END $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS places_notify ON places;
+                CREATE TRIGGER places_notify AFTER INSERT OR UPDATE OR DELETE ON places
+                    FOR EACH ROW EXECUTE FUNCTION notify_places();
+
+                DROP TRIGGER IF EXISTS blacklist_notify ON blacklist;
+                CREATE TRIGGER blacklist_notify AFTER INSERT OR DELETE ON blacklist
+                    FOR EACH ROW EXECUTE FUNCTION notify_blacklist();
+            """)
+
+            # Indexlar
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_places_name ON places(name);
+                CREATE INDEX IF NOT EXISTS idx_places_coords ON places(lat, lng);
+            """)
+
+            # Muddati o'tgan kesh yozuvlarini tozalash
+            await conn.execute("DELETE FROM geocode_cache WHERE expires_at < now()")
+            await conn.execute("DELETE FROM ai_city_cache WHERE expires_at < now()")
 
 async def close_db():
     """Poolni yopish"""
@@ -161,18 +650,67 @@ async def close_db():
         await db_pool.close()
 
 
+async def close_http():
+    """Tashqi HTTP sessiyasini yopish va provayder metrikalarini chiqarish"""
+    for name, st in HTTP.stats.items():
+        print(f"HTTP {name}: {st.calls} so'rov, {st.hits} natija, {st.errors} xato, "
+              f"p50={st.percentile(0.5)} ms")
+    await HTTP.close()
+
+
+# ---------- qora ro'yxat (xotirada) ----------
+BLACKLIST: set[str] = set()
+BLACKLIST_RE: re.Pattern | None = None
+
+
+def _trie_pattern(words: list[str]) -> str:
+    """So'zlarni prefiks-daraxt regexiga aylantiradi: ab|ac → a(?:b|c)"""
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def walk(node: dict) -> str:
+        alts = [re.escape(ch) + walk(child) for ch, child in sorted(node.items()) if ch]
+        if "" in node:
+            # so'z shu yerda tugaydi – davomi ixtiyoriy (substring uchun yetarli)
+            return ""
+        if len(alts) == 1:
+            return alts[0]
+        return "(?:" + "|".join(alts) + ")"
+
+    return walk(trie)
+
+
+def rebuild_blacklist_matcher(words):
+    """Qora ro'yxatni bitta kompilyatsiya qilingan regexga aylantiradi"""
+    global BLACKLIST, BLACKLIST_RE
+    BLACKLIST = {w for w in words if w}
+    BLACKLIST_RE = re.compile(_trie_pattern(sorted(BLACKLIST))) if BLACKLIST else None
+
+
+def is_blacklisted(text: str) -> bool:
+    """Matnda qora ro'yxatdagi so'z bormi (DB ga murojaatsiz)"""
+    return BLACKLIST_RE is not None and BLACKLIST_RE.search(text.lower()) is not None
+
+
 async def add_blacklist_word(word: str):
     """So'zni qora ro'yxatga qo'shish"""
+    word = word.lower()
     async with db_pool.acquire() as conn:
         await conn.execute(
             "INSERT INTO blacklist(word) VALUES($1) ON CONFLICT (word) DO NOTHING",
-            word.lower()
+            word
         )
+    rebuild_blacklist_matcher(BLACKLIST | {word})
 
 async def delete_blacklist_word(word: str):
     """So'zni qora ro'yxatdan o'chirish"""
     async with db_pool.acquire() as conn:
         await conn.execute("DELETE FROM blacklist WHERE word = $1", word)
+    rebuild_blacklist_matcher(BLACKLIST - {word})
 
 async def get_blacklist() -> set[str]:
     """Qora ro'yxatni olish"""
@@ -181,6 +719,318 @@ async def get_blacklist() -> set[str]:
         return {row['word'] for row in rows}
 
 
+async def geo_cache_db_get(key: str):
+    """Keshdan ((lat, lng), qolgan_ttl) yoki None qaytaradi"""
+    if db_pool is None:
+        return None
+    try:
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """SELECT lat, lng, EXTRACT(EPOCH FROM expires_at - now())::float8 AS ttl
+                   FROM geocode_cache WHERE query = $1 AND expires_at > now()""",
+                key
+            )
+    except Exception as e:
+        print(f"Geocode kesh o'qish xatosi: {e}")
+        return None
+    if row is None:
+        return None
+    return (row['lat'], row['lng']), row['ttl']
+
+async def geo_cache_db_put(key: str, coords: tuple, ttl: float):
+    """Natijani (topilmagan bo'lsa ham) keshga yozish"""
+    if db_pool is None:
+        return
+    try:
+        async with db_pool.acquire() as conn:
+            await conn.execute(
+                """INSERT INTO geocode_cache (query, lat, lng, expires_at)
+                   VALUES ($1, $2, $3, now() + make_interval(secs => $4))
+                   ON CONFLICT (query) DO UPDATE
+                   SET lat = EXCLUDED.lat, lng = EXCLUDED.lng, expires_at = EXCLUDED.expires_at""",
+                key, coords[0], coords[1], float(ttl)
+            )
+    except Exception as e:
+        print(f"Geocode kesh yozish xatosi: {e}")
+
+async def ai_cache_db_get(key: str):
+    """AI keshidan (natija, qolgan_ttl) yoki None"""
+    if db_pool is None:
+        return None
+    try:
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """SELECT result, EXTRACT(EPOCH FROM expires_at - now())::float8 AS ttl
+                   FROM ai_city_cache WHERE key = $1 AND expires_at > now()""",
+                key
+            )
+    except Exception as e:
+        print(f"AI kesh o'qish xatosi: {e}")
+        return None
+    if row is None:
+        return None
+    return row['result'], row['ttl']
+
+async def ai_cache_db_put(key: str, result: str, ttl: float):
+    """AI natijasini (bo'sh bo'lsa ham) keshga yozish"""
+    if db_pool is None:
+        return
+    try:
+        async with db_pool.acquire() as conn:
+            await conn.execute(
+                """INSERT INTO ai_city_cache (key, result, expires_at)
+                   VALUES ($1, $2, now() + make_interval(secs => $3))
+                   ON CONFLICT (key) DO UPDATE
+                   SET result = EXCLUDED.result, expires_at = EXCLUDED.expires_at""",
+                key, result, float(ttl)
+            )
+    except Exception as e:
+        print(f"AI kesh yozish xatosi: {e}")
+
+async def short_link_db_get(short_url: str) -> str | None:
+    if db_pool is None:
+        return None
+    try:
+        async with db_pool.acquire() as conn:
+            return await conn.fetchval(
+                "SELECT expanded_url FROM short_links WHERE short_url = $1", short_url
+            )
+    except Exception as e:
+        print(f"Qisqa havola keshini o'qish xatosi: {e}")
+        return None
+
+async def short_link_db_put(short_url: str, expanded_url: str):
+    if db_pool is None:
+        return
+    try:
+        async with db_pool.acquire() as conn:
+            await conn.execute(
+                """INSERT INTO short_links (short_url, expanded_url) VALUES ($1, $2)
+                   ON CONFLICT (short_url) DO UPDATE SET expanded_url = EXCLUDED.expanded_url""",
+                short_url, expanded_url
+            )
+    except Exception as e:
+        print(f"Qisqa havola keshini yozish xatosi: {e}")
+
+
+# ---------------- joy sxemasi va shablon ----------------
+import bisect
+from functools import lru_cache
+
+# places jadvalidagi tuzilmali maydonlar (name, lat, lng dan tashqari);
+# title – matndagi sarlavha name dan farq qilsa (eski yozuvlar), aks holda None
+PLACE_FIELDS = ("number", "title", "city", "map_link", "details", "menu_num",
+                "menu_note", "phones", "telegram", "extra")
+
+# Shablon: (maydon, qator formati) – bo'sh maydon qatori chiqmaydi
+PLACE_TEMPLATE = (
+    ("title", "🍽️ <b>{title}</b>"),
+    ("city", "📍 <a href='{map_link}'>{city}</a>"),
+    ("details", "{details}"),
+    ("menu_num", "📋 <a href='https://t.me/myhalalmenu/{menu_num}'>Меню</a>{menu_note}"),
+    ("phones", "📞 {phones}"),
+    ("telegram", "📱 Telegram: {telegram}"),
+    ("extra", "📝 Qoʻshimcha: {extra}"),
+)
+_TEMPLATE_LINES = tuple((field, fmt.format_map) for field, fmt in PLACE_TEMPLATE)
+
+
+@lru_cache(maxsize=16384)
+def _render(name: str, *values) -> tuple[str, str]:
+    fields = dict(zip(PLACE_FIELDS, values), name=name)
+    fields = {k: v or "" for k, v in fields.items()}
+    fields["title"] = fields["title"] or name
+    user = "\n".join(fmt(fields) for field, fmt in _TEMPLATE_LINES if fields[field])
+    channel = f"#️⃣{fields['number']}\n{user}" if fields["number"] else user
+    return user, channel
+
+
+def render_place(place) -> tuple[str, str]:
+    """Tuzilmali maydonlardan (text_user, text_channel) – bir xil maydonlar uchun keshdan"""
+    return _render(place["name"], *(place.get(f) for f in PLACE_FIELDS))
+
+
+_NUM_RE = re.compile(r"^#️⃣\s*(\S+)$")
+_TITLE_RE = re.compile(r"^🍽️?\s*(?:<b>\s*(.*?)\s*</b>|(.*))$")
+_LOC_RE = re.compile(r"""^📍\s*<a\s+href\s*=\s*["']\s*([^"']*?)\s*["']\s*>([^<]*)</a>$""", re.I)
+_MENU_RE = re.compile(r"""^📋\s*<a\s+href\s*=\s*["']https://t\.me/myhalalmenu/\s*([^"'\s]+)\s*["']\s*>Меню</a>(.*)$""", re.I)
+_TG_RE = re.compile(r"^📱\s*Telegram:\s*(.+)$", re.I)
+_EXTRA_RE = re.compile(r"^📝 Q.*?shimcha:\s*(.*)$")
+
+
+def parse_place_text(text: str, name: str | None = None) -> dict:
+    """
+    Eski HTML matnni maydonlarga ajratadi (bir martalik migratsiya uchun).
+    Tanilmagan qatorlar tartibi bilan details ga tushadi – hech narsa yo'qolmaydi.
+    """
+    fields = dict.fromkeys(PLACE_FIELDS)
+    details = []
+    seen_name = False
+    for line in text.splitlines():
+        s = line.strip()
+        if not s:
+            continue
+        if fields["number"] is None and not seen_name and (m := _NUM_RE.match(s)):
+            fields["number"] = m.group(1)
+        elif not seen_name and (m := _TITLE_RE.match(s)):
+            seen_name = True
+            fields["title"] = (m.group(1) or m.group(2) or "").strip() or None
+        elif fields["city"] is None and (m := _LOC_RE.match(s)):
+            fields["map_link"], fields["city"] = m.group(1), m.group(2).strip()
+        elif fields["menu_num"] is None and (m := _MENU_RE.match(s)):
+            fields["menu_num"], fields["menu_note"] = m.group(1), m.group(2).rstrip() or None
+        elif fields["phones"] is None and s.startswith("📞"):
+            fields["phones"] = s[1:].strip()
+        elif fields["telegram"] is None and (m := _TG_RE.match(s)):
+            fields["telegram"] = m.group(1).strip()
+        elif fields["extra"] is None and (m := _EXTRA_RE.match(s)):
+            fields["extra"] = m.group(1).strip()
+        else:
+            details.append(line.rstrip())
+    fields["details"] = "\n".join(details) or None
+    if fields["title"] == name:
+        fields["title"] = None
+    return fields
+
+
+def wizard_fields(data: dict) -> dict:
+    """AddRest ma'lumotlaridan tuzilmali maydonlar"""
+    return {
+        "number": data.get("number") or None,
+        "title": None,
+        "city": data["city"],
+        "map_link": data["map_link"],
+        "details": data.get("details") or None,
+        "menu_num": data.get("menu_num") or None,
+        "menu_note": None,
+        "phones": data.get("phone") or None,
+        "telegram": data.get("telegram") or None,
+        "extra": (data.get("extra_info") or "").strip() or None,
+    }
+
+
+# Ko'p joyda takrorlanadigan qisqa qiymatlar – bitta obyekt (sys.intern)
+PLACE_INTERNED = {"number", "city", "menu_num", "menu_note", "telegram"}
+
+
+class Place:
+    """
+    Bitta joy – ixcham (__slots__) yozuv. text_user/text_channel saqlanmaydi,
+    shablondan (lru keshdan) olinadi. place["name"] / place.get(...) ham ishlaydi.
+    """
+    __slots__ = ("id", "name", "lat", "lng") + PLACE_FIELDS
+
+    def __init__(self, id: int, name: str, lat: float, lng: float, **fields):
+        self.id = id
+        self.name = name
+        self.lat = lat
+        self.lng = lng
+        for f in PLACE_FIELDS:
+            value = fields.get(f)
+            if f in PLACE_INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, f, value)
+
+    @classmethod
+    def from_row(cls, row) -> "Place":
+        return cls(row["id"], row["name"], row["lat"], row["lng"],
+                   **{f: row[f] for f in PLACE_FIELDS})
+
+    def as_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def replace(self, **changes) -> "Place":
+        """O'zgartirilgan nusxa (yozuvlar joyida o'zgartirilmaydi)"""
+        return Place(**{**self.as_dict(), **changes})
+
+    @property
+    def text_user(self) -> str:
+        return render_place(self)[0]
+
+    @property
+    def text_channel(self) -> str:
+        return render_place(self)[1]
+
+    text = text_user                      # eski kodlar uchun
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+class PlaceRegistry:
+    """id → Place lug'ati va alohida ko'rsatish tartibi (ro'yxat raqami = tartibdagi o'rin)"""
+
+    def __init__(self):
+        self._by_id: dict[int, Place] = {}
+        self._order: list[int] = []       # id lar, o'sish tartibida
+
+    def load(self, places):
+        self._by_id = {p.id: p for p in places}
+        self._order = sorted(self._by_id)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __iter__(self):
+        by_id = self._by_id
+        return (by_id[pid] for pid in self._order)
+
+    def get(self, place_id: int) -> Place | None:
+        return self._by_id.get(place_id)
+
+    def at(self, number: int) -> Place | None:
+        """Ro'yxatdagi 1-bazali raqam bo'yicha"""
+        if 1 <= number <= len(self._order):
+            return self._by_id[self._order[number - 1]]
+        return None
+
+    def put(self, place: Place):
+        """Qo'shish yoki shu id dagi yozuvni almashtirish"""
+        if place.id not in self._by_id:
+            bisect.insort(self._order, place.id)
+        self._by_id[place.id] = place
+
+    def remove(self, place_id: int) -> Place | None:
+        place = self._by_id.pop(place_id, None)
+        if place is not None:
+            del self._order[bisect.bisect_left(self._order, place_id)]
+        return place
+
+
+def place_from_row(row) -> Place:
+    """places qatori → xotiradagi joy (matnlar shablondan)"""
+    return Place.from_row(row)
+
+
+async def migrate_places(conn):
+    """Hali ajratilmagan (structured = false) qatorlarni bir marta maydonlarga o'tkazadi"""
+    rows = await conn.fetch(
+        "SELECT id, name, text_user, text_channel FROM places WHERE NOT structured"
+    )
+    if not rows:
+        return
+    records = []
+    for row in rows:
+        fields = parse_place_text(row["text_channel"] or row["text_user"], row["name"])
+        text_user, text_channel = render_place({"name": row["name"], **fields})
+        records.append((row["id"], *(fields[f] for f in PLACE_FIELDS), text_user, text_channel))
+    cols = ", ".join(f"{f} = ${i}" for i, f in enumerate(PLACE_FIELDS, start=2))
+    n = len(PLACE_FIELDS)
+    async with conn.transaction():
+        await conn.executemany(
+            f"UPDATE places SET {cols}, text_user = ${n + 2}, text_channel = ${n + 3}, "
+            f"structured = TRUE WHERE id = $1",
+            records
+        )
+    print(f"Migratsiya: {len(records)} ta joy maydonlarga ajratildi")
+
+
 async def load_places_from_db():
     """PostgreSQL dan barcha joylarni yuklash"""
     global db_pool
@@ -194,18 +1044,7 @@ async def load_places_from_db():
         if not rows:
             return None
         
-        return [
-            {
-                "id": row['id'],
-                "name": row['name'],
-                "lat": row['lat'],
-                "lng": row['lng'],
-                "text_user": row['text_user'],
-                "text_channel": row['text_channel'],
-                "text": row['text_user']  # eski kodlar uchun
-            }
-            for row in rows
-        ]
+        return [place_from_row(row) for row in rows]
 
 
 
@@ -239,16 +1078,59 @@ def is_gibberish(text: str) -> bool:
     return False
 
 
-async def add_place_to_db(name: str, lat: float, lng: float, text_user: str, text_channel: str) -> int:
-    """Yangi joy qo'shish, ID qaytaradi"""
+async def add_place_to_db(name: str, lat: float, lng: float, fields: dict) -> int:
+    """Yangi joy qo'shish (maydonlar + shablondan matnlar), ID qaytaradi"""
+    if db_pool is None:
+        await init_db()
+    text_user, text_channel = render_place({"name": name, **fields})
+    cols = ", ".join(PLACE_FIELDS)
+    args = ", ".join(f"${i}" for i in range(6, 6 + len(PLACE_FIELDS)))
     async with db_pool.acquire() as conn:
         row = await conn.fetchrow(
-            """INSERT INTO places (name, lat, lng, text_user, text_channel) 
-               VALUES ($1, $2, $3, $4, $5) RETURNING id""",
-            name, lat, lng, text_user, text_channel
+            f"""INSERT INTO places (name, lat, lng, text_user, text_channel, {cols}, structured)
+                VALUES ($1, $2, $3, $4, $5, {args}, TRUE) RETURNING id""",
+            name, lat, lng, text_user, text_channel, *(fields.get(f) for f in PLACE_FIELDS)
         )
         return row['id']
 
+def _place_record(p: dict) -> list:
+    fields = parse_place_text(p["text"], p["name"]) if "text" in p else p
+    text_user, text_channel = render_place({**fields, "name": p["name"]})
+    return [p["name"], p["lat"], p["lng"], text_user, text_channel,
+            *(fields.get(f) for f in PLACE_FIELDS), True]
+
+
+async def bulk_add_places(places, only_if_empty: bool = False) -> list[int]:
+    """
+    Ko'p joyni bitta tranzaksiyada qo'shish (COPY), ID larni kirish tartibida qaytaradi.
+    Har bir element: name, lat, lng va PLACE_FIELDS maydonlari yoki tayyor "text".
+    only_if_empty=True – jadval bo'sh bo'lsagina (tekshiruv shu tranzaksiyada, qulf ostida);
+    places iterator bo'lsa, faqat shunda o'qiladi.
+    """
+    if db_pool is None:
+        await init_db()
+    async with db_pool.acquire() as conn:
+        async with conn.transaction():
+            if only_if_empty:
+                # bir vaqtda ishga tushgan worker/replikalar katalogni takror qo'shmasin
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", DB_LOCK_SEED)
+                if await conn.fetchval("SELECT EXISTS (SELECT 1 FROM places)"):
+                    return []
+            records = [_place_record(p) for p in places]
+            if not records:
+                return []
+            # ID lar oldindan olinadi – COPY RETURNING qilolmaydi
+            ids = [r["id"] for r in await conn.fetch(
+                "SELECT nextval(pg_get_serial_sequence('places', 'id')) AS id "
+                "FROM generate_series(1, $1)", len(records))]
+            await conn.copy_records_to_table(
+                "places",
+                records=[(pid, *rec) for pid, rec in zip(ids, records)],
+                columns=["id", "name", "lat", "lng", "text_user", "text_channel",
+                         *PLACE_FIELDS, "structured"],
+            )
+    return ids
+
 async def get_place_by_id(place_id: int) -> dict | None:
     """ID bo'yicha joy olish"""
     async with db_pool.acquire() as conn:
@@ -265,35 +1147,63 @@ async def swap_places_in_db(id1: int, id2: int):
         # Transaction ichida
         async with conn.transaction():
             # Birinchi joy ma'lumotlari
-            place1 = await conn.fetchrow("SELECT name, text_user, text_channel FROM places WHERE id = $1", id1)
-            place2 = await conn.fetchrow("SELECT name, text_user, text_channel FROM places WHERE id = $1", id2)
+            cols = ("name", "text_user", "text_channel") + PLACE_FIELDS
+            select = f"SELECT {', '.join(cols)} FROM places WHERE id = $1"
+            place1 = await conn.fetchrow(select, id1)
+            place2 = await conn.fetchrow(select, id2)
             
             if not place1 or not place2:
                 return False
             
-            # Almashtirish
-            await conn.execute(
-                "UPDATE places SET name = $1, text_user = $2, text_channel = $3 WHERE id = $4",
-                place2['name'], place2['text_user'], place2['text_channel'], id1
-            )
-            await conn.execute(
-                "UPDATE places SET name = $1, text_user = $2, text_channel = $3 WHERE id = $4",
-                place1['name'], place1['text_user'], place1['text_channel'], id2
-            )
+            # Almashtirish (koordinata va id joyida qoladi)
+            sets = ", ".join(f"{c} = ${i}" for i, c in enumerate(cols, start=1))
+            update = f"UPDATE places SET {sets} WHERE id = ${len(cols) + 1}"
+            await conn.execute(update, *(place2[c] for c in cols), id1)
+            await conn.execute(update, *(place1[c] for c in cols), id2)
             return True
 
 
-async def update_place_field_in_db(place_id: int, field: str, new_value):
-    """Maydonni yangilash (xavfsiz)"""
-    # Ruxsat etilgan maydonlar
-    allowed_fields = {'name', 'lat', 'lng', 'text_user', 'text_channel'}
-    if field not in allowed_fields:
-        raise ValueError(f"Noto'g'ri maydon: {field}")
-    
+# Ruxsat etilgan maydonlar (text_user/text_channel shablondan, qo'lda berilmaydi)
+PLACE_EDITABLE = {"name", "lat", "lng", *PLACE_FIELDS}
+
+
+async def update_place(place_id: int, **fields) -> dict | None:
+    """
+    Bir nechta maydonni bitta UPDATE ... RETURNING * bilan yozadi va PLACES ni qaytgan
+    qatordan yangilaydi. Matnlar xotiradagi nusxadan emas, shu tranzaksiyada qulflangan
+    qatordan yasaladi (boshqa replika o'zgartirgan maydonlar ustidan yozilmaydi).
+    Yangilangan joy yoki None.
+    """
+    unknown = set(fields) - PLACE_EDITABLE
+    if unknown:
+        raise ValueError(f"Noto'g'ri maydon: {', '.join(sorted(unknown))}")
+
     async with db_pool.acquire() as conn:
-        # Parametrlangan so'rov (SQL injection dan himoyalangan)
-        query = f"UPDATE places SET {field} = $1 WHERE id = $2"
-        await conn.execute(query, new_value, place_id)
+        async with conn.transaction():
+            current = await conn.fetchrow("SELECT * FROM places WHERE id = $1 FOR UPDATE", place_id)
+            if current is None:
+                return None
+            text_user, text_channel = render_place({**dict(current), **fields})
+            values = {**fields, "text_user": text_user, "text_channel": text_channel}
+            # Parametrlangan so'rov; ustun nomlari faqat PLACE_EDITABLE dan
+            sets = ", ".join(f"{col} = ${i}" for i, col in enumerate(values, start=2))
+            row = await conn.fetchrow(
+                f"UPDATE places SET {sets} WHERE id = $1 RETURNING *",
+                place_id, *values.values()
+            )
+    return patch_place_in_memory(row) if row else None
+
+
+def patch_place_in_memory(row) -> Place:
+    """places qatorini PLACES, fazoviy indeks va javob keshiga qo'llaydi"""
+    updated = place_from_row(row)
+    old = PLACES.get(updated.id)
+    if old is not None:
+        invalidate_responses_near(old.lat, old.lng)
+    PLACES.put(updated)
+    PLACE_INDEX.add(updated)
+    invalidate_responses_near(updated["lat"], updated["lng"])
+    return updated
 
 async def delete_place_from_db(place_id: int):
     """Joyni o'chirish"""
@@ -302,15 +1212,150 @@ async def delete_place_from_db(place_id: int):
 
 # Windows vs Linux ajratmasdan, har doim bot papkasida saqlaymiz
 
+# ---------- AI natijalari keshi ----------
+AI_CITY_TTL = 30 * 24 * 3600    # shahar topilgan javoblar
+AI_EMPTY_TTL = 7 * 24 * 3600    # "EMPTY" javoblar ham keshlanadi
+ai_city_cache = TTLCache(maxsize=10000, ttl=AI_CITY_TTL)
+AI_CACHE_STATS = {"hit": 0, "db_hit": 0, "miss": 0}
+
+
+def ai_cache_key(text: str) -> str:
+    """strip_greeting dan o'tgan, casefold qilingan matn"""
+    return re.sub(r"\s+", " ", strip_greeting(text).casefold()).strip()
+
+
+# ---------- lokal NER bosqichi (spaCy, protsess puli) ----------
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import ner_worker
+
+NER_WORKERS = int(os.getenv("NER_WORKERS", "2"))   # 0 → bosqich o'chiriladi
+NER_BATCH = 32                                    # bir nlp.pipe chaqiruvida ko'pi bilan
+NER_WINDOW = 0.01                                 # s, to'plam yig'ish oynasi
+NER_TIMEOUT = 2.0                                 # s, bundan keyin AI ga o'tamiz
+
+
+class NerStage:
+    """
+    Xabarlarni qisqa oynada to'plab, til bo'yicha guruhlab, protsess pulida
+    nlp.pipe orqali ishlaydi – CPU og'ir NER event loop'ni to'xtatmaydi.
+    """
+
+    def __init__(self, workers: int, batch: int = NER_BATCH, window: float = NER_WINDOW):
+        self.workers = workers
+        self.batch = batch
+        self.window = window
+        self._pool: ProcessPoolExecutor | None = None
+        self._queue: asyncio.Queue | None = None
+        self._runner: asyncio.Task | None = None
+        self._jobs: set[asyncio.Task] = set()
+
+    def start(self):
+        """Pul va to'plovchini ishga tushiradi; modellar worker'larda fonda yuklanadi"""
+        if self.workers <= 0 or self._pool is not None:
+            return
+        # fork: worker'lar app.py ni qayta import qilmaydi (spawn/forkserver __main__ ni
+        # qayta bajaradi). start() thread'lar ochilishidan oldin, main() boshida chaqiriladi.
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=ner_worker.warm,
+        )
+        self._queue = asyncio.Queue()
+        self._runner = asyncio.create_task(self._run())
+        # birinchi topshiriqda barcha worker'lar ochiladi va modellarni yuklay boshlaydi
+        self._pool.submit(ner_worker.nlp_model, "en")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._runner = None
+
+    async def extract(self, text: str) -> str:
+        """Matndagi birinchi GPE/LOC yoki '' (bosqich o'chirilgan / kechikkan bo'lsa ham)"""
+        if self._pool is None:
+            return ""
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, fut))
+        try:
+            return await asyncio.wait_for(fut, NER_TIMEOUT)
+        except Exception:
+            return ""
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.batch:
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            groups: dict[str, list] = {}
+            for text, fut in batch:
+                groups.setdefault(detect_lang(text), []).append((text, fut))
+            for lang, items in groups.items():
+                job = asyncio.create_task(self._dispatch(lang, items))
+                self._jobs.add(job)
+                job.add_done_callback(self._jobs.discard)
+
+    async def _dispatch(self, lang: str, items: list):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._pool, ner_worker.extract_batch, lang, [t for t, _ in items]
+            )
+        except Exception as e:
+            print(f"NER xatosi: {e}")
+            results = [""] * len(items)
+        for (_, fut), res in zip(items, results):
+            if not fut.done():
+                fut.set_result(res)
+
+
+NER = NerStage(NER_WORKERS)
+
+
 async def ai_extract_city(text: str) -> str:
     """
     Matndan AQSh shahar yoki shtat nomini ajratadi.
-    Har qanday shahar uchun ishlaydi (kichik yoki katta).
+    Bir xil so'rovlar uchun OpenAI qayta chaqirilmaydi (LRU + PostgreSQL kesh).
     """
-    t = strip_greeting(text).strip()
-    if not t or len(t) < 2:
+    key = ai_cache_key(text)
+    if not key or len(key) < 2:
         return ""
-    
+
+    cached = ai_city_cache.get(key)
+    if cached is not None:
+        AI_CACHE_STATS["hit"] += 1
+        return cached
+
+    row = await ai_cache_db_get(key)
+    if row is not None:
+        result, ttl = row
+        AI_CACHE_STATS["db_hit"] += 1
+        ai_city_cache.set(key, result, ttl=ttl)
+        return result
+
+    AI_CACHE_STATS["miss"] += 1
+    result = await ai_extract_city_upstream(strip_greeting(text).strip())
+    if result is None:                 # xato bo'lsa keshlamaymiz
+        return ""
+    ttl = AI_CITY_TTL if result else AI_EMPTY_TTL
+    ai_city_cache.set(key, result, ttl=ttl)
+    await ai_cache_db_put(key, result, ttl)
+    return result
+
+
+async def ai_extract_city_upstream(t: str) -> str | None:
+    """
+    Matndan AQSh shahar yoki shtat nomini ajratadi.
+    Har qanday shahar uchun ishlaydi (kichik yoki katta).
+    Xato bo'lsa None qaytaradi.
+    """
     try:
         r = await ai.chat.completions.create(
             model="gpt-3.5-turbo",  # yoki "gpt-4" agar aniqroq natija kerak bo'lsa
@@ -348,1105 +1393,281 @@ async def ai_extract_city(text: str) -> str:
         return result
     except Exception as e:
         print(f"AI extraction error: {e}")
-        return ""
+        return None
+
+# Boshlang'ich katalog: faqat places bo'sh bo'lganda o'qiladi (JSON Lines, 1-qator – sarlavha)
+SEED_PLACES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "initial_places.jsonl")
+SEED_VERSION = 1
+
+
+def iter_seed_places(path: str = SEED_PLACES_PATH):
+    """Katalogni qatorma-qator o'qiydi: name, lat, lng va PLACE_FIELDS maydonlari"""
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != SEED_VERSION:
+            raise ValueError(f"{path}: noma'lum versiya {header.get('version')}")
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
 
 # ✅ app.py boshiga (allqachon bor, lekin to‘liq)
 async def load_places():
     rows = await load_places_from_db()
     if rows is None:                       # birinchi marta
-        for p in initial_places:
-            await add_place_to_db(
-                p["name"], p["lat"], p["lng"],
-                p["text"],                 # text_user
-                p["text"]                  # text_channel
-            )
+        await bulk_add_places(iter_seed_places(), only_if_empty=True)
         rows = await load_places_from_db()
     return rows
 
 # ✅ PLACES ni bot ishga tushishi bilan yuklaymiz
-PLACES = []  # boshlang'ich qiymat
-
-
-
-initial_places = [
-            {
-                "name": "CHAIHANA-AMIR",
-                "lat": 38.61700400,
-                "lng": -121.53797100,
-                "text": (
-                    "🍽️ <b>CHAIHANA-AMIR</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=38.61700400 ,-121.53797100">Sacramento, CA</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    "📞 +19167506977  +19169405677\n"
-                    '📋 <a href="https://t.me/myhalalmenu/8 ">Меню</a>\n'
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )          
-            },
-            {
-                "name": "XADICHAI-KUBRO",
-                "lat": 38.61708200,
-                "lng": -121.53778900,
-                "text": (
-                    "🍽️ <b>XADICHAI-KUBRO</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=38.61708200 ,-121.53778900">Sacramento, CA</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 6–7 ч до доставки\n"
-                    "⏰ 08:00 – 19:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/9 ">Меню</a> (в комментариях)\n'
-                    "📞 +12797901986\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "UMAR-UZBEK-NATIONAL-FOOD",
-                "lat": 38.61700400,
-                "lng": -121.53797100,
-                "text": (
-                    "🍽️ <b>UMAR UZBEK NATIONAL FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=38.61700400 ,-121.53797100">Sacramento, CA</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Заказы за 4–5 ч до доставки\n"
-                    "⏰ 10:00 – 20:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/10 ">Меню</a> (в комментариях)\n'
-                    "📞 +19165333778\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "RANO-OPA-KITCHEN",
-                "lat": 37.80681200,
-                "lng": -122.41256100,
-                "text": (
-                    "🍽️ <b>RANO OPA KITCHEN – HALOL MILLIY UZBEK TAOMLARI</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=37.80681200 ,-122.41256100">San Francisco, CA</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/11 ">Меню</a> (в комментариях)\n'
-                    "📞 +15107782614\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "DENVER-HALAL-FOOD",
-                "lat": 39.79106000,
-                "lng": -104.90467400,
-                "text": (
-                    "🍽️ <b>DENVER HALAL FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=39.79106000 ,-104.90467400">Denver, CO</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 09:00 – 00:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/12 ">Меню</a> (в комментариях)\n'
-                    "📞 +17207564155\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "TRUCKERS-HALAL-FOOD",
-                "lat": 39.73438200,
-                "lng": -104.84645600,
-                "text": (
-                    "🍽️ <b>TRUCKERS HALAL FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=39.73438200 ,-104.84645600">Denver, CO</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 08:00 – 00:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/13 ">Меню</a> (в комментариях)\n'
-                    "📞 +17209935823\n"
-                    "📱 Telegram: @MYHALAL_FOOD, @Denverfood"
-                )
-            },
-            {
-                "name": "BAUYRSAQ-EXPRESS",
-                "lat": 47.24476600,
-                "lng": -122.38548700,
-                "text": (
-                    "🍽️ <b>BAUYRSAQ EXPRESS – Uzbek · Kazakh · Kirgiz kitchen</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=47.24476600 ,-122.38548700">Tacoma, WA</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/14 ">Меню</a> (в комментариях)\n'
-                    "📞 +14257577206\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "ASIA-HALAL-FOOD",
-                "lat": 47.24476600,
-                "lng": -122.38548700,
-                "text": (
-                    "🍽️ <b>ASIA HALAL FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=47.24476600 ,-122.38548700">Tacoma, WA</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/15 ">Меню</a> (в комментариях)\n'
-                    "📞 +18782294148  +18782294149\n"
-                    "📱 Telegram: @MYHALAL_FOOD, @AsiaHalalFood"
-                )
-            },
-            {
-                "name": "UZBEK-HALOL-FOOD",
-                "lat": 47.24476600,
-                "lng": -122.38548700,
-                "text": (
-                    "🍽️ <b>UZBEK HALOL FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=47.24476600 ,-122.38548700">Tacoma, WA</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 08:00 – 22:00\n"
-                    "🚘 Доставка бесплатно\n"
-                    '📋 <a href="https://t.me/myhalalmenu/16 ">Меню</a> (в комментариях)\n'
-                    "📞 +13609306392  +12534485190\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "AMIN-FOOD",
-                "lat": 47.24476600,
-                "lng": -122.38548700,
-                "text": (
-                    "🍽️ <b>AMIN FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=47.24476600 ,-122.38548700">Tacoma, WA</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 08:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/18 ">Меню</a> (в комментариях)\n'
-                    "📞 +19167380322\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "CARAVAN-RESTAURANT-2",
-                "lat": 47.66120600,
-                "lng": -122.32378600,
-                "text": (
-                    "🍽️ <b>CARAVAN RESTAURANT – 2</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=47.66120600 ,-122.32378600">Seattle, WA</a>\n'
-                    "🏠 Ресторан\n"
-                    "🗺 Адреса:\n"
-                    "— <a href=\"https://maps.app.goo.gl/RiKVT3aQoJbWZ3xg8 \">405 NE 45th St, Seattle, WA 98105</a>\n"
-                    "— <a href=\"https://maps.app.goo.gl/LrTdvgjfGZzxe2mr6 \">7801 Detroit Ave SW, Seattle, WA 98106</a>\n"
-                    "— <a href=\"https://maps.app.goo.gl/zs2dnzLgCF6h1SoC8 \">3215 4th Ave S, Seattle, WA</a>\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 11:00 – 23:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/19 ">Меню</a> (в комментариях)\n'
-                    "📞 +12065457499\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "SADIYA-OSHXONASI",
-                "lat": 39.27019000,
-                "lng": -84.44163700,
-                "text": (
-                    "🍽️ <b>SADIYA OSHXONASI VA CAKE LAB</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=39.27019000 ,-84.44163700">Cincinnati, OH</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 09:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/20 ">Меню</a> (в комментариях)\n'
-                    "📞 +15134449371\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "DELICIOUS-FOODS",
-                "lat": 39.26986100,
-                "lng": -84.43900900,
-                "text": (
-                    "🍽️ <b>DELICIOUS FOODS</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=39.26986100 ,-84.43900900">Cincinnati, OH</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 4 ч до доставки\n"
-                    "⏰ 09:00 – 20:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/21 ">Меню</a> (в комментариях)\n'
-                    "📞 +15134046762\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "ROBIYA-BAKERY",
-                "lat": 39.26866500,
-                "lng": -84.43942300,
-                "text": (
-                    "🍽️ <b>ROBIYA BAKERY</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=39.26866500 ,-84.43942300">Cincinnati, OH</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 4–5 ч до доставки\n"
-                    "⏰ 09:00 – 21:00\n"
-                    "🚘 Доставка по Dayton и Hebron\n"
-                    '📋 <a href="https://t.me/myhalalmenu/22 ">Меню</a> (в комментариях)\n'
-                    "📞 +15132249300\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "CHAYHANA-1",
-                "lat": 39.31210400,
-                "lng": -84.37738100,
-                "text": (
-                    "🍽️ <b>CHAYHANA №1</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=39.31210400 ,-84.37738100">Cincinnati, OH</a>\n'
-                    "🍴 Ресторан\n"
-                    "🧾 Блюда готовы, можно забрать\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/23 ">Меню</a> (в комментариях)\n'
-                    "📞 +15137550596\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "SHEF-MOM",
-                "lat": 39.38454100,
-                "lng": -84.34233300,
-                "text": (
-                    "🍽️ <b>SHEF MOM – CAKE – SUSHI</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=39.38454100 ,-84.34233300">Cincinnati, OH</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 5 ч до доставки\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/24 ">Меню</a> (в комментариях)\n'
-                    "📞 +14704000770\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "TAJIKSKO-UZBEKSKAYA-KUHNYA",
-                "lat": 41.28132000,
-                "lng": -96.21969700,
-                "text": (
-                    "🍽️ <b>Таджикско-узбекская Национальная кухня</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=41.28132000 ,-96.21969700">Omaha, NE</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/25 ">Меню</a> (в комментариях)\n'
-                    "📞 +14026168772\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "ZARINA-FOOD",
-                "lat": 40.28957100,
-                "lng": -76.88458100,
-                "text": (
-                    "🍽️ <b>ZARINA FOOD UYGʻUR OSHXONASI</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=40.28957100 ,-76.88458100">Harrisburg, PA</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 08:00 – 18:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/26 ">Меню</a> (в комментариях)\n'
-                    "📞 +17175626326\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "PIZZA-BARI",
-                "lat": 40.44370500,
-                "lng": -79.99612500,
-                "text": (
-                    "🍽️ <b>PIZZA BARI</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=40.44370500 ,-79.99612500">Pittsburgh, PA</a>\n'
-                    "🏠 Кафе\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 10:00 – 02:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/28 ">Меню</a> (в комментариях)\n'
-                    "📞 +14124020444  +14126090714\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "MUSOJON",
-                "lat": 33.55247500,
-                "lng": -112.15317400,
-                "text": (
-                    "🍽️ <b>MUSOJON</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=33.55247500 ,-112.15317400">Phoenix, AZ</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 05:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/29 ">Меню</a> (в комментариях)\n'
-                    "📞 +16028201597\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "ARIZONA-HALAL-FOOD-1",
-                "lat": 33.53869100,
-                "lng": -112.18625700,
-                "text": (
-                    "🍽️ <b>ARIZONA HALAL FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=33.53869100 ,-112.18625700">Phoenix, AZ</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 4–5 ч до доставки\n"
-                    "⏰ 08:00 – 20:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/30 ">Меню</a> (в комментариях)\n'
-                    "📞 +14807891711\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "TOSHKENT-MILLIY-TAOMLARI",
-                "lat": 33.49340800,
-                "lng": -112.33416100,
-                "text": (
-                    "🍽️ <b>TOSHKENT MILLIY TAOMLARI</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=33.49340800 ,-112.33416100">Phoenix, AZ</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 07:00 – 21:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/31 ">Меню</a> (в комментариях)\n'
-                    "📞 +16232056021  +16023489938\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "ALIS-KITCHEN",
-                "lat": 33.46092400,
-                "lng": -112.25515400,
-                "text": (
-                    "🍽️ <b>ALI'S KITCHEN</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=33.46092400 ,-112.25515400">Phoenix, AZ</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 09:00 – 00:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/32 ">Меню</a> (в комментариях)\n'
-                    "📞 +16026997010\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "UZBEK-HALAL-FOODS-MEMPHIS",
-                "lat": 35.04594700,
-                "lng": -90.02337700,
-                "text": (
-                    "🍽️ <b>UZBEK HALAL FOODS</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/DxTwbfJaypEZvf647 ">Memphis, TN</a> (Arkansas border)\n'
-                    "🏠 Фудтрак\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 09:00 – 23:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/33 ">Меню</a> (в комментариях)\n'
-                    "📞 +15126693163\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "MADI-FOOD",
-                "lat": 28.03012900,
-                "lng": -82.45883800,
-                "text": (
-                    "🍽️ <b>MADI FOOD (Uygʻurcha taomlar)</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=28.03012900 ,-82.45883800">Tampa, FL</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/34 ">Меню</a> (в комментариях)\n'
-                    "📞 +17178058368\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "CHAYHANA-ORLANDO",
-                "lat": 28.66596900,
-                "lng": -81.41681300,
-                "text": (
-                    "🍽️ <b>CHAYHANA ORLANDO</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=28.66596900 ,-81.41681300">Orlando, FL</a>\n'
-                    "🏠 Ресторан\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 11:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/35 ">Меню</a> (в комментариях)\n'
-                    "📞 +13214220143\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "CARAVAN-RESTAURANT-CHICAGO",
-                "lat": 41.87811400,
-                "lng": -87.62979800,
-                "text": (
-                    "🍽️ <b>CARAVAN RESTAURANT</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/gj72DoxeAVhTFgsy5 ">Chicago, IL</a>\n'
-                    "🏠 Ресторан\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/36 ">Меню</a> (в комментариях)\n'
-                    "📞 +17733673258\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "TAKU-FOOD",
-                "lat": 41.98429200,
-                "lng": -87.69751100,
-                "text": (
-                    "🍽️ <b>TAKU FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=41.98429200 ,-87.69751100">Chicago, IL</a>\n'
-                    "🏠 Ресторан\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 08:00 – 23:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/37 ">Меню</a> (в комментариях)\n'
-                    "📞 +12247600211  +17736812626\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "KAZAN-KEBAB",
-                "lat": 41.77922600,
-                "lng": -88.34295400,
-                "text": (
-                    "🍽️ <b>KAZAN KEBAB</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=41.77922600 ,-88.34295400">Chicago, IL</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/38 ">Меню</a> (в комментариях)\n'
-                    "📞 +15517869980\n"
-                    "📱 Telegram: @Ali071188, @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "MAKSAT-FOOD-TRUCK",
-                "lat": 45.52630600,
-                "lng": -122.63703900,
-                "text": (
-                    "🍽️ <b>MAKSAT FOOD TRUCK</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=45.52630600 ,-122.63703900">Portland, OR</a>\n'
-                    "🚛 Фудтрак\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 10:00 – 23:00\n"
-                    "🚘 Доставка бесплатная\n"
-                    '📋 <a href="https://t.me/myhalalmenu/39 ">Меню</a> (в комментариях)\n'
-                    "📞 +13602108483\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "NAVAT-PDX",
-                "lat": 45.54936400,
-                "lng": -122.66185700,
-                "text": (
-                    "🍽️ <b>NAVAT PDX</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=45.54936400 ,-122.66185700">Portland, OR</a>\n'
-                    "🚛 Фудтрак\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 11:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/40 ">Меню</a> (в комментариях)\n'
-                    "📞 +14254282011  +17253774764\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "OSH-RESTAURANT-AND-GRILL",
-                "lat": 36.11125400,
-                "lng": -86.74126300,
-                "text": (
-                    "🍽️ <b>OSH RESTAURANT AND GRILL</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=36.11125400 ,-86.74126300">Nashville, TN</a>\n'
-                    "🏠 Ресторан\n"
-                    "🧾 Заказы до 21:00\n"
-                    "⏰ Вт–Вс: 11:00 – 21:00 | Пн: выходной\n"
-                    "🚘 Доставка: 10:00 – 02:00\n"
-                    '📋 <a href="https://t.me/myhalalmenu/42 ">Меню</a> (в комментариях)\n'
-                    "📞 +16157102288  +16159684444  +16157129985\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "BROOKLYN-PIZZA",
-                "lat": 36.11934500,
-                "lng": -86.74898100,
-                "text": (
-                    "🍽️ <b>BROOKLYN PIZZA</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=36.11934500 ,-86.74898100">Nashville, TN</a>\n'
-                    "🏠 Кафе\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка: 24/7 — $1 за милю\n"
-                    '📋 <a href="https://t.me/myhalalmenu/43 ">Меню</a> (в комментариях)\n'
-                    "📞 +16159552222  +16159257070\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "KAMOLA-OSHXONASI",
-                "lat": 35.96075200,
-                "lng": -83.92075000,
-                "text": (
-                    "🍽️ <b>KAMOLA OSHXONASI</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/Z83tPnCtbYSxLuCL9 ">Knoxville, TN</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 4–5 ч до доставки\n"
-                    "⏰ 09:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/44 ">Меню</a> (в комментариях)\n'
-                    "📞 +18654100845\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "UZBEGIM-RESTAURANT",
-                "lat": 36.16266400,
-                "lng": -86.78160200,
-                "text": (
-                    "🍽️ <b>UZBEGIM RESTAURANT</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/9U3e96s2EmA6sUMG6 ">Nashville, TN</a>\n'
-                    "🏠 Кафе\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ Время уточняется\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/45 ">Меню</a> (в комментариях)\n'
-                    "📞 +13476138691\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "BARAKAT-HALAL-FOOD",
-                "lat": 29.78456000,
-                "lng": -95.80117000,
-                "text": (
-                    "🍽️ <b>BARAKAT HALAL FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=29.78456000 ,-95.80117000">Houston, TX</a>\n'
-                    "🏠 Фудтрак\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка 24/7\n"
-                    '📋 <a href="https://t.me/myhalalmenu/46 ">Меню</a> (в комментариях)\n'
-                    "📞 +13463772939\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "DIYAR-HOUSTON-FOOD",
-                "lat": 29.77985100,
-                "lng": -95.88196500,
-                "text": (
-                    "🍽️ <b>DIYAR HOUSTON FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=29.77985100 ,-95.88196500">Houston, TX</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 4–5 ч до доставки\n"
-                    "⏰ 09:30 – 23:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/47 ">Меню</a> (в комментариях)\n'
-                    "📞 +13462740363\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "CARAVAN-HOUSE",
-                "lat": 41.04526200,
-                "lng": -81.58033400,
-                "text": (
-                    "🍽️ <b>CARAVAN HOUSE</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=41.04526200 ,-81.58033400">Akron, OH</a>\n'
-                    "🏠 Ресторан рядом с AMAZON\n"
-                    "🧾 Продукты готовы, можно купить сразу\n"
-                    "⏰ 09:00 – 23:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/48 ">Меню</a> (в комментариях)\n'
-                    "📞 +14405755555  +12344020202\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "CHAYHANA-PERRYSBURG",
-                "lat": 41.57081200,
-                "lng": -83.62053800,
-                "text": (
-                    "🍽️ <b>CHAYHANA</b>\n"
-                    "📍 Perrysburg / Toledo, OH\n"
-                    "🏠 Ресторан\n"
-                    "🧾 Заказы за 4–5 ч до доставки\n"
-                    "⏰ 08:00 – 00:00\n"
-                    "🚘 Доставка через Uber / DoorDash\n"
-                    '📋 <a href="https://t.me/myhalalmenu/49 ">Меню</a> (в комментариях)\n'
-                    "📞 +14196034800\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "TASHKENTFOOD-HALAL",
-                "lat": 39.44555600,
-                "lng": -84.20035400,
-                "text": (
-                    "🍽️ <b>Tashkentfood Xalal</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/8aKnspJrH5vPfMq79 ">Lebanon, OH</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2 ч до получения\n"
-                    "⏰ 08:00 – 21:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/50 ">Меню</a> (в комментариях)\n'
-                    "📞 +15133321404\n"
-                    "📱 Telegram: @MYHALAL_FOOD, @Tashkent halal food Ohio"
-                )
-            },
-            {
-                "name": "NUR-KITCHEN",
-                "lat": 30.43137000,
-                "lng": -97.75393400,
-                "text": (
-                    "🍽️ <b>NUR KITCHEN</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=30.43137000 ,-97.75393400">Austin, TX</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 09:00 – 21:00\n"
-                    "🚘 Доставка: бесплатно по Austin, Pflugerville, San Marcos\n"
-                    '📋 <a href="https://t.me/myhalalmenu/53 ">Меню</a> (в комментариях)\n'
-                    "📞 +17377078330\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "MAZALI-CHARLOTTE-OSHXONASI",
-                "lat": 35.23408200,
-                "lng": -80.87282000,
-                "text": (
-                    "🍽️ <b>MAZALI CHARLOTTE OSHXONASI</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=35.23408200 ,-80.87282000">Charlotte, NC</a>\n'
-                    "🏠 Ресторан\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ Пн–Пт: 11:00 – 20:00 | Сб–Вс: выходной\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/54 ">Меню</a> (в комментариях)\n'
-                    "📞 +13477856222  +13476666930\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "NND-FOOD",
-                "lat": 35.25497600,
-                "lng": -80.97975000,
-                "text": (
-                    "🍽️ <b>N.N.D FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=35.25497600 ,-80.97975000">Charlotte, NC</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/55 ">Меню</a> (в комментариях)\n'
-                    "📞 +17045764025  +17046191145  +19802393354\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "AFSONA",
-                "lat": 40.63575300,
-                "lng": -73.97448900,
-                "text": (
-                    "🍽️ <b>Afsona</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=40.63575300 ,-73.97448900">Brooklyn, NY</a>\n'
-                    "🏠 Ресторан\n"
-                    "🧾 Заказы заранее, еду можно забирать\n"
-                    "⏰ 06:00 – 23:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/57 ">Меню</a> (в комментариях)\n'
-                    "📞 +17186333006  +19296224444  +19294002252\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "UZBEKISTAN-TAOMLARI",
-                "lat": 40.09541213,
-                "lng": -75.04420414,
-                "text": (
-                    "🍽️ <b>UZBEKISTAN TAOMLARI</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=40.09541213 ,-75.04420414">Bustleton, PA</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы заранее\n"
-                    "⏰ Время уточняется\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/58 ">Меню</a> (в комментариях)\n'
-                    "📞 +12672442371\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "BARAKAT-KAZAKH-CUISINE",
-                "lat": 34.11959200,
-                "lng": -83.76195000,
-                "text": (
-                    "🍽️ <b>Barakat Казахская Cuisine</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=34.11959200 ,-83.76195000">Braselton, GA</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 09:00 – 18:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/59 ">Меню</a> (в комментариях)\n'
-                    "📞 +14706689307\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "VIRGINIA-DC-UZBEK-HALAL",
-                "lat": 38.79516300,
-                "lng": -77.52366300,
-                "text": (
-                    "🍽️ <b>Virginia & DC Uzbek Halal Food</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=38.79516300 ,-77.52366300">Virginia / DC Area</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 07:00 – 00:00\n"
-                    "🚘 Доставка: I-66, I-95, I-81\n"
-                    '📋 <a href="https://t.me/myhalalmenu/60 ">Меню</a> (в комментариях)\n'
-                    "📞 +15716327034\n"
-                    "📱 Telegram: @MYHALAL_FOOD, @virginia_halal_food"
-                )
-            },
-            {
-                "name": "ISLOM-BALTIMORE-FOOD",
-                "lat": 39.36578700,
-                "lng": -76.75882500,
-                "text": (
-                    "🍽️ <b>ISLOM BALTIMORE FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=39.36578700 ,-76.75882500">Baltimore, MD</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 07:00 – 18:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/61 ">Меню</a> (в комментариях)\n'
-                    "📞 +15677070708\n"
-                    "📱 Telegram: @MYHALAL_FOOD, @Madinakhonmd"
-                )
-            },
-            {
-                "name": "IRODA-OSHXONASI",
-                "lat": 30.41205600,
-                "lng": -88.82872200,
-                "text": (
-                    "🍽️ <b>IRODA OSHXONASI</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/wCDtog9z5zeqyAeY8 ">Ocean Springs, MS</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за день до доставки\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/62 ">Меню</a> (в комментариях)\n'
-                    "📞 +12282432635\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "TASHKENT-CUISINE",
-                "lat": 40.44291300,
-                "lng": -80.08243800,
-                "text": (
-                    "🍽️ <b>TASHKENT CUISINE</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=40.44291300 ,-80.08243800">Pittsburgh, PA</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/63 ">Меню</a> (в комментариях)\n'
-                    "📞 +14125190156\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "ARIZONA-HALAL-FOOD-2",
-                "lat": 33.46083600,
-                "lng": -112.20724400,
-                "text": (
-                    "🍽️ <b>ARIZONA HALAL FOOD</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=33.46083600 ,-112.20724400">Phoenix, AZ</a>\n'
-                    "🏠 Кухня на вынос из дома\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 08:00 – 00:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/64 ">Меню</a> (в комментариях)\n'
-                    "📞 +14806343188\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "SILK-ROAD-UZBEK-KAZAKH",
-                "lat": 34.05223500,
-                "lng": -117.60254700,
-                "text": (
-                    "🍽️ <b>SILK ROAD UZBEK - KAZAKH kitchen</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/LbdR5qiVbxSYt4F49 ">Ontario, CA (TA Truck Stop)</a>\n'
-                    "🚛 Фудтрак\n"
-                    "🧾 Блюда готовы к выдаче\n"
-                    "⏰ 08:00 – 23:00\n"
-                    "🚘 Доставка до 50 миль\n"
-                    '📋 <a href="https://t.me/myhalalmenu/65 ">Меню</a> (в комментариях)\n'
-                    "📞 +18722221736\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "HALAL-FOOD-IN-NASHVILLE",
-                "lat": 36.04294500,
-                "lng": -86.74166700,
-                "text": (
-                    "🍽️ <b>HALAL FOOD IN NASHVILLE</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=36.04294500 ,-86.74166700">Nashville, TN</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 30 мин до доставки\n"
-                    "⏰ 07:00 – 23:00\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/66 ">Меню</a> (в комментариях)\n'
-                    "📞 +16156913309\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "HALOL-FOOD-MUHAMMADAMIN-ASAKA",
-                "lat": 36.18959100,
-                "lng": -86.47507800,
-                "text": (
-                    "🍽️ <b>HALOL FOOD MUHAMMADAMIN ASAKA</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=36.18959100 ,-86.47507800">Nashville, TN</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2 ч до доставки\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/67 ">Меню</a> (в комментариях)\n'
-                    "📞 +12159296717  +18352059595\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "UZBEK-FOOD-MINNESOTA",
-                "lat": 44.97775300,
-                "lng": -93.26501100,
-                "text": (
-                    "🍽️ <b>UZBEK FOOD MINNESOTA</b>\n"
-                    "📍 Minneapolis, MN\n"
-                    "🏠 Кухня на вынос из дома\n"
-                    "🧾 Заказы за 4–5 ч до доставки\n"
-                    "⏰ 08:00 – 22:00\n"
-                    "🚘 Доставка есть\n"
-                    "📋 Меню: смотреть в комментариях\n"
-                    "📞 +16513525551\n"
-                    "📱 Telegram: @Manzura_Burkhan, @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "OASIS-DLYA-TRAKEROV",
-                "lat": 32.77666500,
-                "lng": -96.79698900,
-                "text": (
-                    "🍽️ <b>ОАЗИС ДЛЯ ТРАКЕРОВ</b>\n"
-                    "📍 Dallas, TX\n"
-                    "🏠 Доставка свежей домашней еды к вашей парковке (до 30 миль)\n"
-                    "✨ Условия доставки:\n"
-                    "— Минимум $30\n"
-                    "— Доставка $15\n"
-                    "— Бесплатно от $250\n"
-                    "🧾 100% халяль: борщи, плов, пельмени, салаты, выпечка\n"
-                    "🚚 Заказ за 3–4 ч до получения\n"
-                    "💰 Скидки постоянным\n"
-                    '🌐 <a href="https://t.me/oasiseda ">Меню</a>\n'
-                    "📞 +13478881927\n"
-                    "📱 Telegram: https://t.me/oasiseda , @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "GOLDEN-BY-NUSAYBA",
-                "lat": 39.92883400,
-                "lng": -74.23729300,
-                "text": (
-                    "🍽️ <b>GOLDEN BY NUSAYBA</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/N58gFq6UrewBrBWm7 ">New Jersey, Lakewood</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Готовлю по желанию клиента\n"
-                    "⏰ 08:00 – 00:00\n"
-                    "🚘 Доставка есть\n"
-                    "📋 Меню: смотреть в Instagram\n"
-                    "📞 +13478137000\n"
-                    "📱 Instagram: @golden_by_nusayba_nj"
-                )
-            },
-            {
-                "name": "UZBEKISTAN-RESTAURANT-CINCINNATI",
-                "lat": 39.10311800,
-                "lng": -84.51202000,
-                "text": (
-                    "🍽️ <b>UZBEKISTAN RESTAURANT</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/28d42BXtNPUZ9D7GA ">Cincinnati Ohio</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 10:00 – 22:00\n"
-                    "🚘 Доставка 24/7\n"
-                    '📋 <a href="https://t.me/myhalalmenu/72 ">Меню</a>\n'
-                    "📞 +12674230301\n"
-                    "📱 Telegram: @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "BISMILLAH-HALAL-FOOD",
-                "lat": 41.87811400,
-                "lng": -87.62979800,
-                "text": (
-                    "🍽️ <b>Bismillah HALAL FOOD</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/az7BJLtakcbejw4K6 ">Chicago IL</a>\n'
-                    "🏠 Домашняя кухня\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/73 ">Меню</a>\n'
-                    "📞 +14075957655\n"
-                )
-            },
-            {
-                "name": "KHOZYAYUSHKA-UZBEK-KITCHEN",
-                "lat": 36.07954100,
-                "lng": -86.69676900,
-                "text": (
-                    "🍽️ <b>Хозяюшка Uzbek kitchen</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=36.07954100 ,-86.69676900">Nashville, TN</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/78 ">Меню</a> (в комментариях)\n'
-                    "📞 +16159799172\n"
-                    "📱 Telegram: @Xozayush, @MYHALAL_FOOD"
-                )
-            },
-            {                   
-                "name": "ATLAS-KITCHEN",
-                "lat": 38.85842400,
-                "lng": -94.81290200,
-                "text": (
-                    "🍽️ <b>ATLAS KITCHEN</b>\n"
-                    '📍 <a href="https://www.google.com/maps?q=38.85842400 ,-94.81290200">Kansas City, KS/MO</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 4–5 ч до доставки\n"
-                    "⏰ 15:00 – 22:00\n"
-                    "🚘 Доставка: Договорная\n"
-                    '📋 <a href="https://t.me/myhalalmenu/81 ">Меню</a> (в комментариях)\n'
-                    "📞 +19134869109  +19899544770\n"
-                    "📱 Telegram: @Sabru_jamil1, @Bek_KC"
-                )
-            },    
-            {
-                "name": "RAIANA-HALAL-FOOD",
-                "lat": 38.58157200,
-                "lng": -121.49440000,
-                "text": (
-                    "🍽️ <b>RAIANA halal food</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/bgCVHfHMcR3hfdzx5 ">Sacramento, CA</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 2–3 ч до доставки\n"
-                    "⏰ 24/7\n"
-                    "🚘 Доставка есть\n"
-                    '📋 <a href="https://t.me/myhalalmenu/79 ">Меню</a> (в комментариях)\n'
-                    "📞 +17732567187  +1773256893\n"
-                    "📱 Telegram: @Raiana_halal_food, @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "HALAL-JASMIN-KITCHEN",
-                "lat": 39.09972700,
-                "lng": -94.57856700,
-                "text": (
-                    "🍽️ <b>Halal Jasmin Kitchen</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/MTc7JWSzKxafXtH27 ">Kansas</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 1.5–2 ч до доставки\n"
-                    "⏰ 09:00 – 00:00\n"
-                    "🚘 Бесплатная доставка по Kansas City\n"
-                    '📋 <a href="https://t.me/myhalalmenu/80 ">Меню</a> (в комментариях)\n'
-                    "📞 +18162991870\n"
-                    "📱 Telegram: @Rozazhasmin, @MYHALAL_FOOD"
-                )
-            },
-            {
-                "name": "YASINA-FOOD",
-                "lat": 28.53833600,
-                "lng": -81.37923400,
-                "text": (
-                    "🍽️ <b>Yasina Food</b>\n"
-                    '📍 <a href="https://maps.app.goo.gl/eVZw1iT74fqb9LSMA ">Orlando FL</a>\n'
-                    "🏠 Домашняя кухня на вынос\n"
-                    "🧾 Заказы за 3–4 ч до доставки\n"
-                    "⏰ 09:00 – 22:00\n"
-                    "🚘 Доставка по тракстопам\n"
-                    '📋 <a href="https://t.me/myhalalmenu/82 ">Меню</a> (в комментариях)\n'
-                    "📞 +16892389299\n"
-                    "📱 Telegram: @yasishfood, @MYHALAL_FOOD"
-                )
-            }
-        ]
+PLACES = PlaceRegistry()
 
 
 
-async def add_place_to_db(name: str, lat: float, lng: float, text_user: str, text_channel: str) -> int:
-    """Yangi joy qo'shish va uning ID sini qaytarish"""
-    global db_pool
-    
-    if db_pool is None:
-        await init_db()
-    
-    async with db_pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """INSERT INTO places (name, lat, lng, text_user, text_channel) 
-               VALUES ($1, $2, $3, $4, $5) 
-               RETURNING id""",
-            name, lat, lng, text_user, text_channel
-        )
-        return row['id']
+
+
+
+# ---------------- FSM holati (PostgreSQL) ----------------
+import contextvars, datetime
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+
+FSM_TTL = datetime.timedelta(hours=float(os.getenv("FSM_TTL_HOURS", "72")))
+FSM_CLEANUP_EVERY = 3600                 # s
+FSM_CLEANUP_BATCH = 1000
+
+# key → [state, data]: bitta update davomida takroriy o'qishlar DB ga bormaydi.
+# Har bir update o'z task'ida ishlaydi, shuning uchun kesh task konteksti bilan birga yo'qoladi.
+_fsm_cache: contextvars.ContextVar[dict | None] = contextvars.ContextVar("fsm_cache", default=None)
+
+
+class PgStorage(BaseStorage):
+    """
+    aiogram FSM holati db_pool dagi fsm_state jadvalida – replikalar va restartlar orasida saqlanadi.
+    Holatlar faqat admin oqimlarida ishlatiladi: boshqa foydalanuvchilar uchun DB ga murojaat yo'q.
+    """
+
+    @staticmethod
+    def _tracked(key: StorageKey) -> bool:
+        return key.user_id in ADMIN_ID
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return (f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:"
+                f"{key.business_connection_id or ''}:{key.destiny}")
+
+    @staticmethod
+    def _cache() -> dict:
+        cache = _fsm_cache.get()
+        if cache is None:
+            cache = {}
+            _fsm_cache.set(cache)
+        return cache
+
+    async def _read(self, key: StorageKey) -> list:
+        if not self._tracked(key):
+            return [None, {}]
+        k = self._key(key)
+        cache = self._cache()
+        if k not in cache:
+            async with db_pool.acquire() as conn:
+                row = await conn.fetchrow("SELECT state, data FROM fsm_state WHERE key = $1", k)
+            cache[k] = [row["state"], json.loads(row["data"])] if row else [None, {}]
+        return cache[k]
+
+    async def _write(self, key: StorageKey, state: str | None, data: dict):
+        if not self._tracked(key):
+            return
+        k = self._key(key)
+        async with db_pool.acquire() as conn:
+            if state is None and not data:
+                await conn.execute("DELETE FROM fsm_state WHERE key = $1", k)
+            else:
+                await conn.execute("""
+                    INSERT INTO fsm_state (key, state, data, updated_at)
+                    VALUES ($1, $2, $3::jsonb, now())
+                    ON CONFLICT (key) DO UPDATE
+                    SET state = EXCLUDED.state, data = EXCLUDED.data, updated_at = now()
+                """, k, state, json.dumps(data, ensure_ascii=False))
+        self._cache()[k] = [state, data]
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        _, data = await self._read(key)
+        await self._write(key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._read(key))[0]
+
+    async def set_data(self, key: StorageKey, data) -> None:
+        state, _ = await self._read(key)
+        await self._write(key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> dict:
+        return dict((await self._read(key))[1])
+
+    async def close(self) -> None:
+        pass                               # pool ni close_db() yopadi
+
+
+async def cleanup_fsm_states():
+    """FSM_TTL dan eski holatlarni bo'laklab o'chiradi (uzun qulflarsiz)"""
+    while True:
+        try:
+            deleted = 0
+            while True:
+                async with db_pool.acquire() as conn:
+                    status = await conn.execute("""
+                        DELETE FROM fsm_state WHERE key IN (
+                            SELECT key FROM fsm_state WHERE updated_at < now() - $1::interval
+                            LIMIT $2
+                        )
+                    """, FSM_TTL, FSM_CLEANUP_BATCH)
+                n = int(status.split()[-1])
+                deleted += n
+                if n < FSM_CLEANUP_BATCH:
+                    break
+            if deleted:
+                print(f"FSM: {deleted} ta eskirgan holat o'chirildi")
+        except Exception as e:
+            print(f"FSM tozalash xatosi: {e}")
+        await asyncio.sleep(FSM_CLEANUP_EVERY)
 
 
 # ---------------- global o'zgaruvchilar ---------------- 
 # ---------------- bot va dispatcher ----------------
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
 bot = Bot(token=BOT_TOKEN,
+          session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+          if TELEGRAM_API_URL else None,
           default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher()
-geolocator = Nominatim(user_agent="halal_bot")
+dp = Dispatcher(storage=PgStorage())
 
-import spacy
+# ---------------- chiquvchi xabarlar navbati ----------------
+from aiogram.exceptions import TelegramRetryAfter
 
+SEND_GLOBAL_RATE   = float(os.getenv("SEND_GLOBAL_RATE", "25"))      # xabar/s, butun bot
+SEND_CHAT_RATE     = float(os.getenv("SEND_CHAT_RATE", "1"))         # xabar/s, shaxsiy chat
+SEND_GROUP_PER_MIN = float(os.getenv("SEND_GROUP_PER_MIN", "20"))    # xabar/min, guruh va kanal
+SEND_BURST         = 3                   # chat bo'yicha ketma-ket bo'laklar
+SEND_MAX_QUEUE     = 50                  # chat navbatidagi ishlar chegarasi
+SEND_MAX_RETRIES   = 3                   # RetryAfter dan keyin qayta urinishlar
+SEND_IDLE          = 60.0                # s, bo'sh chat worker'i yopiladi
 
 
-# Inglizcha model
-try:
-    nlp_en = spacy.load("en_core_web_sm")
-except OSError:
-    import subprocess, sys
-    subprocess.run([sys.executable, "-m", "spacy", "download", "en_core_web_sm"], check=True)
-    nlp_en = spacy.load("en_core_web_sm")
+class SendQueueFull(Exception):
+    """Chat navbati to'la – ish qabul qilinmadi"""
+
+
+class TelegramSender:
+    """
+    Chat bo'yicha FIFO navbat: bitta ish (ko'p bo'lakli javob) bo'laklari tartib bilan,
+    boshqa javoblar aralashmasdan yuboriladi. Har bir xabar chat va umumiy
+    token-bucket'dan o'tadi; TelegramRetryAfter da kutib, qayta yuboriladi.
+    """
+
+    def __init__(self):
+        self.global_bucket = TokenBucket(rate=SEND_GLOBAL_RATE, capacity=SEND_GLOBAL_RATE)
+        self._queues: dict[int, asyncio.Queue] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self.stats = {"queued": 0, "sent": 0, "retry_after": 0, "failed": 0,
+                      "dropped": 0, "max_depth": 0}
+
+    def depth(self) -> int:
+        """Hamma chatlarda navbatda turgan ishlar soni"""
+        return sum(q.qsize() for q in self._queues.values())
+
+    def send(self, chat_id: int, texts: list[str], **kwargs) -> asyncio.Future:
+        """
+        Ishni navbatga qo'yadi; future yuborilgan Message lar ro'yxati bilan tugaydi.
+        Navbat to'la bo'lsa – SendQueueFull, yuborib bo'lmasa – Telegram xatosi.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = asyncio.Queue()
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id, queue))
+        if queue.qsize() >= SEND_MAX_QUEUE:
+            self.stats["dropped"] += 1
+            fut.set_exception(SendQueueFull(f"chat {chat_id}: {queue.qsize()} ish navbatda"))
+            return fut
+        queue.put_nowait((texts, kwargs, fut))
+        self.stats["queued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.depth())
+        return fut
+
+    async def _worker(self, chat_id: int, queue: asyncio.Queue):
+        rate = SEND_CHAT_RATE if chat_id > 0 else SEND_GROUP_PER_MIN / 60
+        bucket = TokenBucket(rate=rate, capacity=SEND_BURST)
+        fut = None
+        try:
+            while True:
+                try:
+                    texts, kwargs, fut = await asyncio.wait_for(queue.get(), SEND_IDLE)
+                except asyncio.TimeoutError:
+                    return
+                sent = []
+                try:
+                    for text in texts:
+                        sent.append(await self._deliver(bucket, chat_id, text, kwargs))
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    print(f"Yuborish ({chat_id}) xatosi: {e}")
+                    if not fut.done():
+                        fut.set_exception(e)
+                else:
+                    if not fut.done():
+                        fut.set_result(sent)
+        finally:
+            self._queues.pop(chat_id, None)
+            self._workers.pop(chat_id, None)
+            if fut is not None and not fut.done():
+                fut.cancel()                 # yuborilayotgan ish – kutayotgan handler osilib qolmasin
+            while not queue.empty():
+                queue.get_nowait()[2].cancel()
+
+    async def _deliver(self, bucket: TokenBucket, chat_id: int, text: str, kwargs: dict):
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                msg = await bot.send_message(chat_id, text, **kwargs)
+            except TelegramRetryAfter as e:
+                self.stats["retry_after"] += 1
+                if attempt == SEND_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(e.retry_after)
+            else:
+                self.stats["sent"] += 1
+                return msg
+
+    async def close(self, timeout: float = 5.0):
+        """Navbatdagilarni timeout gacha yuborib, qolganini bekor qiladi"""
+        workers = list(self._workers.values())
+        while self.depth() and timeout > 0:
+            await asyncio.sleep(0.1)
+            timeout -= 0.1
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        print("Yuborish navbati: " + ", ".join(f"{k}={v}" for k, v in self.stats.items()))
+
+
+SEND = TelegramSender()
+
+
+async def reply_parts(message: types.Message, parts: list[str], **kwargs):
+    """Javob bo'laklarini bitta navbat ishi sifatida reply qilib yuboradi (navbat to'la → [])"""
+    kwargs.setdefault("disable_web_page_preview", True)
+    kwargs.setdefault("reply_to_message_id", message.message_id)
+    if message.is_topic_message:
+        kwargs.setdefault("message_thread_id", message.message_thread_id)
+    try:
+        return await SEND.send(message.chat.id, parts, **kwargs)
+    except SendQueueFull as e:
+        print(f"Javob tashlab ketildi: {e}")
+        return []
 
-# Ruscha model (spacy-udpipe o‘rniga spacy modeli)
-try:
-    nlp_ru = spacy.load("ru_core_news_sm")
-except OSError:
-    import subprocess, sys
-    subprocess.run([sys.executable, "-m", "spacy", "download", "ru_core_news_sm"], check=True)
-    nlp_ru = spacy.load("ru_core_news_sm")
 
 # ---------------- masofa (None xavfsiz) ----------------
 # Agar siz haversine ichida print qo'shgan bo'lsangiz, uni ham olib tashlang:
@@ -1467,15 +1688,180 @@ def haversine(lat1, lon1, lat2, lon2):
         return float('inf')
 
 
+# ---------------- fazoviy indeks (PLACES uchun) ----------------
+EARTH_R_KM = 6371.0
+KM_PER_DEG = 111.32
+
+
+class PlaceIndex:
+    """
+    Joylar uchun ustunli (columnar) saqlash + 1°×1° grid.
+    φ, λ, cos φ uzluksiz float64 massivlarda (radianda) turadi,
+    masofalar bitta vektorlashgan numpy o'tishida hisoblanadi.
+    """
+
+    def __init__(self, cell_deg: float = 1.0, capacity: int = 256):
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._row: dict[int, int] = {}          # id → qator
+        self._cell_of: dict[int, tuple[int, int]] = {}
+        self._places: list = []                # qator → joy (Place)
+        self._phi = np.empty(capacity, dtype=np.float64)
+        self._lam = np.empty(capacity, dtype=np.float64)
+        self._cos = np.empty(capacity, dtype=np.float64)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def _grow(self):
+        cap = max(2 * len(self._phi), 16)
+        for name in ("_phi", "_lam", "_cos"):
+            arr = np.empty(cap, dtype=np.float64)
+            arr[:self._n] = getattr(self, name)[:self._n]
+            setattr(self, name, arr)
+
+    def add(self, place: dict):
+        """Joyni qo'shish yoki (koordinatasi o'zgargan bo'lsa) yangilash"""
+        pid = place["id"]
+        self.remove(pid)
+        lat, lng = place.get("lat"), place.get("lng")
+        if lat is None or lng is None:
+            return
+        if self._n == len(self._phi):
+            self._grow()
+        r = self._n
+        φ = math.radians(lat)
+        self._phi[r], self._lam[r], self._cos[r] = φ, math.radians(lng), math.cos(φ)
+        self._places.append(place)
+        self._row[pid] = r
+        self._n += 1
+        cell = self._cell(lat, lng)
+        self._cell_of[pid] = cell
+        self._cells.setdefault(cell, set()).add(pid)
+
+    def remove(self, place_id: int):
+        """O'chirilgan qatorga oxirgi qator ko'chiriladi (massiv uzluksiz qoladi)"""
+        r = self._row.pop(place_id, None)
+        if r is None:
+            return
+        cell = self._cell_of.pop(place_id)
+        bucket = self._cells[cell]
+        bucket.discard(place_id)
+        if not bucket:
+            del self._cells[cell]
+
+        last = self._n - 1
+        if r != last:
+            moved = self._places[last]
+            self._places[r] = moved
+            self._phi[r], self._lam[r], self._cos[r] = self._phi[last], self._lam[last], self._cos[last]
+            self._row[moved["id"]] = r
+        self._places.pop()
+        self._n -= 1
+
+    def rebuild(self, places: list[dict]):
+        self.__init__(self.cell_deg, capacity=max(256, 2 * len(places)))
+        for p in places:
+            self.add(p)
+
+    def distances(self, lat: float, lng: float, rows=None) -> tuple[np.ndarray, np.ndarray]:
+        """Berilgan (yoki barcha) qatorlargacha masofa: (saralangan qatorlar, km)"""
+        if rows is None:
+            rows = np.arange(self._n)
+        φ1, λ1 = math.radians(lat), math.radians(lng)
+        φ2, λ2 = self._phi[rows], self._lam[rows]
+        a = np.sin((φ2 - φ1) * 0.5) ** 2 + math.cos(φ1) * self._cos[rows] * np.sin((λ2 - λ1) * 0.5) ** 2
+        d = 2 * EARTH_R_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        order = np.argsort(d, kind="stable")
+        return rows[order], d[order]
+
+    def _rows_near(self, lat: float, lng: float, km: float):
+        """Grid bo'yicha nomzod qatorlar (None → hammasi)"""
+        dlat = km / KM_PER_DEG
+        cos0 = max(math.cos(math.radians(lat)), 1e-6)
+        dlng = min(km / (KM_PER_DEG * cos0), 180.0)
+        i0, j0 = self._cell(lat - dlat, lng - dlng)
+        i1, j1 = self._cell(lat + dlat, lng + dlng)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            return None
+        row = self._row
+        return np.fromiter(
+            (row[pid]
+             for i in range(i0, i1 + 1)
+             for j in range(j0, j1 + 1)
+             for pid in self._cells.get((i, j), ())),
+            dtype=np.intp,
+        )
+
+    def within_radius(self, lat: float, lng: float, km: float) -> list[tuple[float, dict]]:
+        """km radiusdagi joylar: [(masofa, joy)], yaqinidan uzog'iga"""
+        rows, d = self.distances(lat, lng, self._rows_near(lat, lng, km))
+        cut = int(np.searchsorted(d, km, side="right"))
+        places = self._places
+        return [(float(dist), places[r]) for r, dist in zip(rows[:cut].tolist(), d[:cut].tolist())]
+
+    def nearest(self, lat: float, lng: float, k: int = 1) -> list[tuple[float, dict]]:
+        """Eng yaqin k ta joy"""
+        if k <= 0 or not self._n:
+            return []
+        rows, d = self.distances(lat, lng)
+        places = self._places
+        return [(float(dist), places[r]) for r, dist in zip(rows[:k].tolist(), d[:k].tolist())]
+
+
+PLACE_INDEX = PlaceIndex()
+
+
+def places_within(lat: float, lng: float, km: float = 100) -> list[dict]:
+    """Radius ichidagi joylar PLACES tartibida (id bo'yicha)"""
+    found = PLACE_INDEX.within_radius(lat, lng, km)
+    return [p for _, p in sorted(found, key=lambda x: x[1]["id"])]
+
+
+# ---------------- tayyor javoblar keshi ----------------
+RESPONSE_RADIUS_KM = 100
+response_cache = TTLCache(maxsize=2000, ttl=24 * 3600)
+
+
+def response_key(lat: float, lng: float) -> tuple[float, float]:
+    """~100 m aniqlikdagi kalit; javob aynan shu nuqta uchun hisoblanadi"""
+    return round(lat, 3), round(lng, 3)
+
+
+def render_places_near(lat: float, lng: float) -> list[str]:
+    """Radiusdagi joylar – yuborishga tayyor bo'laklar (bo'sh ro'yxat → joy yo'q)"""
+    key = response_key(lat, lng)
+    chunks = response_cache.get(key)
+    if chunks is None:
+        found = places_within(key[0], key[1], RESPONSE_RADIUS_KM)
+        chunks = split_text("\n\n".join(get_display_text(p) for p in found)) if found else []
+        response_cache.set(key, chunks)
+    return chunks
+
+
+def invalidate_responses_near(lat: float | None, lng: float | None):
+    """Joy qo'shilsa/o'zgarsa/o'chirilsa – uni o'z ichiga olgan javoblarni o'chiradi"""
+    if lat is None or lng is None:
+        return
+    for key in response_cache.keys():
+        if haversine(lat, lng, key[0], key[1]) <= RESPONSE_RADIUS_KM + 0.01:
+            response_cache.pop(key)
+    # javob o'zgardi – takroriy so'rovga eski xabarga ishora qilinmaydi
+    for key in recent_answers.keys():
+        if haversine(lat, lng, key[1][0], key[1][1]) <= RESPONSE_RADIUS_KM + 0.01:
+            recent_answers.pop(key)
+
+
 # ---------------- shaharni matndan ajratib olish ----------------
 
 
 
 import re
 import asyncio
-from geopy.geocoders import Nominatim
-
-geolocator = Nominatim(user_agent="halal_bot")
 
 async def smart_usa_coords(text: str) -> tuple[float, float] | tuple[None, None]:
     """
@@ -1517,13 +1903,14 @@ async def smart_usa_coords(text: str) -> tuple[float, float] | tuple[None, None]
 
     # 4) geopy orqali topamiz
     try:
-        geo = await asyncio.to_thread(
-            geolocator.geocode,
-            query,
-            language="en",
-            timeout=10,
-            exactly_one=True
-        )
+        await GEO_LIMITS["nominatim"].acquire()
+        async with HTTP.track("nominatim"):
+            geo = await geolocator_nom.geocode(
+                query,
+                language="en",
+                timeout=PROVIDER_TIMEOUTS["nominatim"],
+                exactly_one=True
+            )
         if geo and "united states" in geo.address.lower():
             return geo.latitude, geo.longitude
     except Exception:
@@ -1532,27 +1919,61 @@ async def smart_usa_coords(text: str) -> tuple[float, float] | tuple[None, None]
 
 
 import re
-import requests
 from urllib.parse import unquote
 
-def parse_gmaps_link(url: str) -> tuple[float | None, float | None]:
+# ---------------- qisqa havolalarni kengaytirish (async) ----------------
+SHORT_LINK_SEM = asyncio.Semaphore(4)           # bir vaqtda ko'pi bilan 4 ta redirect
+short_link_cache = TTLCache(maxsize=2000, ttl=30 * 24 * 3600)
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+
+def is_short_link(url: str) -> bool:
+    return "maps.app.goo.gl" in url or "goo.gl" in url
+
+
+async def expand_short_url(url: str) -> str:
+    """
+    Qisqa havolani event loop'ni to'xtatmasdan kengaytiradi.
+    Natija xotirada va short_links jadvalida saqlanadi; xato bo'lsa asl havola qaytadi.
+    """
+    url = url.strip()
+    if not is_short_link(url):
+        return url
+
+    expanded = short_link_cache.get(url)
+    if expanded is not None:
+        return expanded
+
+    expanded = await short_link_db_get(url)
+    if expanded is None:
+        try:
+            async with SHORT_LINK_SEM:
+                async with HTTP.get("links", url, headers=BROWSER_HEADERS, allow_redirects=True) as resp:
+                    expanded = str(resp.url)
+        except Exception as e:
+            print(f"Redirect xatosi: {e}")
+            return url
+        await short_link_db_put(url, expanded)
+
+    short_link_cache.set(url, expanded)
+    return expanded
+
+
+async def parse_gmaps_link(url: str) -> tuple[float | None, float | None]:
+    """Qisqa havolani kengaytirib, koordinatalarni ajratadi"""
+    if is_short_link(url):
+        url = await expand_short_url(url)
+    return coords_from_gmaps_url(url)
+
+
+def coords_from_gmaps_url(url: str) -> tuple[float | None, float | None]:
     """
     Google Maps havolasidan latitude va longitude ajratib oladi.
-    Qisqa havolalarni kengaytiradi va turli formatlarni qo'llab-quvvatlaydi.
+    Turli formatlarni qo'llab-quvvatlaydi (qisqa havola oldin kengaytirilgan bo'lishi kerak).
     """
     try:
-        # 1. Qisqa havolani kengaytirish (agar bo'lsa)
-        if "maps.app.goo.gl" in url or "goo.gl" in url:
-            try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                resp = requests.get(url, headers=headers, allow_redirects=True, timeout=15)
-                url = resp.url
-            except Exception as e:
-                print(f"Redirect xatosi: {e}")
-                pass
-        
         # 🔑 MUHIM: Har qanday havolani URL decode qilish (%20, %2C kabilarni tozalash)
         url = unquote(url)
 
@@ -1599,20 +2020,6 @@ def parse_gmaps_link(url: str) -> tuple[float | None, float | None]:
     
     return None, None
 
-def extract_city_spacy(text: str) -> str:
-    """
-    spaCy orqali shahar nomini ajratib oladi.
-    Tilni detect_lang() bilan aniqlaymiz (langdetect ishlatilmaydi).
-    """
-    lang = detect_lang(text)          # ← o‘zimizning funksiyamiz
-    nlp = nlp_ru if lang == "ru" else nlp_en
-    doc = nlp(text)
-
-    for ent in doc.ents:
-        if ent.label_ in {"GPE", "LOC"}:
-            return ent.text
-    return ""
-
 class SwapLocation(StatesGroup):
     waiting_first  = State()   # birinchi restoran raqami
     waiting_second = State()   # ikkinchi restoran raqami
@@ -1633,7 +2040,7 @@ class AddRest(StatesGroup):
 
 class EditDeleteRest(StatesGroup):
     waiting_for_number = State()   # foydalanuvchi raqam kiritmoqda
-    edit_index = State()           # tahrirlanayotgan restoran indeksi
+    edit_index = State()           # tahrirlanayotgan restoran (edit_id)
     action = State()               # qaysi maydon tahrirlanmoqda
     waiting_location_link = State()  # ← NEW: havola kutilmoqda
 
@@ -1642,14 +2049,14 @@ class EditNumFilter(BaseFilter):
 
     async def __call__(self, call: types.CallbackQuery) -> bool | dict:
         match = self.pattern.match(call.data)
-        return {"edit_index": int(match.group(1))} if match else False
+        return {"place_id": int(match.group(1))} if match else False
 
 class EditLocLinksFilter(BaseFilter):
     pattern = re.compile(r"^edit_location_links_(\d+)$")
 
     async def __call__(self, call: types.CallbackQuery) -> bool | dict:
         match = self.pattern.match(call.data)
-        return {"edit_index": int(match.group(1))} if match else False
+        return {"place_id": int(match.group(1))} if match else False
 
 class SwapLocation(StatesGroup):
     waiting_first  = State()   # birinchi restoran raqami
@@ -1683,7 +2090,7 @@ def admin_main_menu_ikb() -> InlineKeyboardMarkup:
 @dp.callback_query(F.data == "list_blacklist")
 async def list_blacklist(call: types.CallbackQuery, state: FSMContext):
     await call.answer()
-    words = await get_blacklist()
+    words = sorted(BLACKLIST)
     if not words:
         await call.message.answer("❌ Qora ro‘yxat bo‘sh.")
         return
@@ -1698,7 +2105,7 @@ async def list_blacklist(call: types.CallbackQuery, state: FSMContext):
 @dp.message(BlacklistManage.waiting_number, F.text.isdigit)
 async def choose_blacklist_word(message: types.Message, state: FSMContext):
     num = int(message.text)
-    words = sorted(await get_blacklist())
+    words = sorted(BLACKLIST)
     if not (1 <= num <= len(words)):
         await message.answer("❌ Noto‘g‘ri raqam.")
         return
@@ -1716,7 +2123,7 @@ async def choose_blacklist_word(message: types.Message, state: FSMContext):
 
 
 @dp.callback_query(F.data == "confirm_del_blacklist", BlacklistManage.waiting_confirm)
-async def delete_blacklist_word(call: types.CallbackQuery, state: FSMContext):
+async def confirm_del_blacklist(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     word = data["word"]
     await delete_blacklist_word(word)
@@ -1840,25 +2247,9 @@ async def save_extra_info(message: types.Message, state: FSMContext):
 async def show_confirmation(src: types.Message | types.CallbackQuery,
                             state: FSMContext):
     data = await state.get_data()
-    extra = data.get('extra_info', '').strip()
-
-    # 1️⃣ Kanalga yuboriladigan TO‘LIQ matn (raqam bilan)
-    channel_text = (
-        f"#️⃣{data['number']}\n"
-        f"🍽️ <b>{data['name']}</b>\n"
-        f"📍 <a href='{data['map_link']}'>{data['city']}</a>\n"
-        f"{data['details']}\n"
-        f"📋 <a href='https://t.me/myhalalmenu/{data['menu_num']}'>Меню</a>\n"
-        f"📞 {data['phone']}\n"
-        f"📱 Telegram: {data['telegram']}\n"
-    )
-    if extra:
-        channel_text += f"📝 Qoʻshimcha: {extra}\n"
-
-    # 2️⃣ Foydalanuvchiga ko‘rsatiladigan TO‘LIQ matn (raqamsiz)
-    user_text = re.sub(r'^#️⃣\d+\n', '', channel_text, flags=re.M)
 
-    await state.update_data(channel_text=channel_text, user_text=user_text)
+    # 1️⃣ Shablondan: kanal matni (raqam bilan) va foydalanuvchi matni (raqamsiz)
+    user_text, channel_text = render_place({"name": data["name"], **wizard_fields(data)})
 
     # 3️⃣ To‘g‘ri yuborish metodini tanlaymiz
     send = (
@@ -1895,7 +2286,7 @@ async def cancel_add(call: types.CallbackQuery, state: FSMContext):
 @dp.callback_query(F.data == "confirm_add")
 async def confirm_add(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    lat, lng = parse_gmaps_link(data['map_link'])
+    lat, lng = await parse_gmaps_link(data['map_link'])
     if lat is None:
         lat, lng = await coords_from_any(data['city'])
     if lat is None:
@@ -1904,46 +2295,30 @@ async def confirm_add(call: types.CallbackQuery, state: FSMContext):
         await call.message.answer("🔗 Yangi Google-Maps havolasini yuboring:")
         return
 
-    extra = data.get('extra_info', '').strip()
+    fields = wizard_fields(data)
 
-    channel_text = (
-        f"#️⃣{data['number']}\n"
-        f"🍽️ <b>{data['name']}</b>\n"
-        f"📍 <a href='{data['map_link']}'>{data['city']}</a>\n"
-        f"{data['details']}\n"
-        f"📋 <a href='https://t.me/myhalalmenu/{data['menu_num']}'>Меню</a>\n"
-        f"📞 {data['phone']}\n"
-        f"📱 Telegram: {data['telegram']}\n"
-    )
-    if extra:
-        channel_text += f"📝 Qoʻshimcha: {extra}\n"
-
-    user_text = re.sub(r'^#️⃣\d+\n', '', channel_text, flags=re.M)
-
-    new_place = {
-        "name": data['name'],
-        "lat": lat,
-        "lng": lng,
-        "text_user": user_text,
-        "text_channel": channel_text,
-        "text": user_text
-    }
-
-    # JSON emas, SQLite ga yozamiz
-    await add_place_to_db(
-        new_place["name"],
-        new_place["lat"],
-        new_place["lng"],
-        new_place["text_user"],
-        new_place["text_channel"]
-    )
+    # JSON emas, PostgreSQL ga yozamiz
+    place_id = await add_place_to_db(data['name'], lat, lng, fields)
+    new_place = Place(place_id, data['name'], lat, lng, **fields)
+    channel_text = new_place.text_channel
 
     # xotiraga ham qo‘shamiz (foydalanish oson)
-    PLACES.append(new_place)
+    PLACES.put(new_place)
+    PLACE_INDEX.add(new_place)
+    invalidate_responses_near(lat, lng)
 
-    await bot.send_message(CHANNEL_ID, channel_text, parse_mode=ParseMode.HTML)
+    try:
+        await SEND.send(CHANNEL_ID, [channel_text], parse_mode=ParseMode.HTML)
+        posted = True
+    except Exception as e:
+        print(f"Kanalga yuborish xatosi: {e}")
+        posted = False
     await call.message.edit_reply_markup(reply_markup=None)
-    await call.answer("✅ Yangi restoran muvaffaqiyatli qo‘shildi va kanalga yuborildi!", show_alert=True)
+    if posted:
+        await call.answer("✅ Yangi restoran muvaffaqiyatli qo‘shildi va kanalga yuborildi!", show_alert=True)
+    else:
+        await call.answer("⚠️ Restoran bazaga qo‘shildi, lekin kanalga yuborilmadi. "
+                          "Kanalga qo‘lda joylang.", show_alert=True)
     await state.clear()
 
 # ---------------- barcha restoranlar ----------------
@@ -1983,12 +2358,11 @@ async def back_to_admin_main(call: types.CallbackQuery):
 # ---------------- tahrirlash/ochirish uchun raqam kiritish ----------------
 @dp.message(EditDeleteRest.waiting_for_number, F.text.isdigit())
 async def handle_number_input(message: types.Message, state: FSMContext):
-    num = int(message.text)
-    if 1 <= num <= len(PLACES):
-        place = PLACES[num - 1]
-        await state.update_data(edit_index=num - 1)
+    place = PLACES.at(int(message.text))
+    if place is not None:
+        await state.update_data(edit_id=place.id)
         display_text = get_display_text(place)
-        await message.answer(f"Siz tanladingiz:\n\n{display_text}", reply_markup=get_edit_delete_kb(num - 1))  # ← 0-bazadagi indeks
+        await message.answer(f"Siz tanladingiz:\n\n{display_text}", reply_markup=get_edit_delete_kb(place.id))
     else:
         await message.answer("❌ Noto‘g‘ri raqam. Iltimos, ro‘yxatdagi raqamdan birini kiriting.")
 
@@ -1996,23 +2370,23 @@ async def handle_number_input(message: types.Message, state: FSMContext):
 async def handle_invalid_input(message: types.Message):
     await message.answer("❌ Iltimos, faqat raqam kiriting.")
 
-def get_edit_delete_kb(index: int) -> InlineKeyboardMarkup:
+def get_edit_delete_kb(place_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✏️ Tahrirlash", callback_data=f"edit_{index}"),InlineKeyboardButton(text="🗑️ O'chirish", callback_data=f"delete_{index}")]
+        [InlineKeyboardButton(text="✏️ Tahrirlash", callback_data=f"edit_{place_id}"),InlineKeyboardButton(text="🗑️ O'chirish", callback_data=f"delete_{place_id}")]
     ])
 
 # ---------------- tahrirlash ----------------
 @dp.callback_query(EditNumFilter())
-async def prompt_edit_rest(call: types.CallbackQuery, state: FSMContext, edit_index: int):
-    if 0 <= edit_index < len(PLACES):
-        place = PLACES[edit_index]
-        await state.update_data(edit_index=edit_index)
+async def prompt_edit_rest(call: types.CallbackQuery, state: FSMContext, place_id: int):
+    place = PLACES.get(place_id)
+    if place is not None:
+        await state.update_data(edit_id=place_id)
         display_text = get_display_text(place)
 
         kb = [
             [InlineKeyboardButton(text="🍽 Restoran nomi", callback_data="edit_name")],
             [InlineKeyboardButton(text="📍 Joylashuv nomi", callback_data="edit_location_names")],
-            [InlineKeyboardButton(text="🔗 Joylashuv havolasi", callback_data=f"edit_location_links_{edit_index}")],
+            [InlineKeyboardButton(text="🔗 Joylashuv havolasi", callback_data=f"edit_location_links_{place_id}")],
             [InlineKeyboardButton(text="📋 Tafsilotlar", callback_data="edit_details")],
             [InlineKeyboardButton(text="📝 Menyu raqami", callback_data="edit_menu_num")],
             [InlineKeyboardButton(text="📞 Telefon raqami", callback_data="edit_phone")],
@@ -2020,8 +2394,7 @@ async def prompt_edit_rest(call: types.CallbackQuery, state: FSMContext, edit_in
         ]
 
         # 📝 Qo'shimcha bormi?
-        txt = place.get("text", "") or place.get("text_user", "") or place.get("text_channel", "")
-        if re.search(r'^📝 Q.*?shimcha:', txt, flags=re.M):
+        if place.get("extra"):
             kb.append([InlineKeyboardButton(text="📝 Qoʻshimcha", callback_data="edit_extra")])
 
         kb.append([InlineKeyboardButton(text="❌ Bekor qilish", callback_data="cancel_edit")])
@@ -2040,192 +2413,50 @@ async def prompt_edit_name(call: types.CallbackQuery, state: FSMContext):
     await state.update_data(edit_action="name")
 
 
-async def reload_single_place_in_memory(place_id: int):
-    """Bitta joyni PostgreSQL dan qayta yuklash va PLACES da yangilash"""
-    global PLACES, db_pool
-    
-    if db_pool is None:
-        await init_db()
-    
-    async with db_pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT * FROM places WHERE id = $1", 
-            place_id
-        )
-        
-        if row:
-            updated = {
-                "id": row['id'],
-                "name": row['name'],
-                "lat": row['lat'],
-                "lng": row['lng'],
-                "text_user": row['text_user'],
-                "text_channel": row['text_channel'],
-                "text": row['text_user']  # eski kodlar uchun
-            }
-            
-            for i, p in enumerate(PLACES):
-                if p["id"] == place_id:
-                    PLACES[i] = updated
-                    break
-
-
-
+# Tahrirlash amali → (maydon, javob)
+EDIT_ACTIONS = {
+    "name": ("name", "✅ Restoran nomi yangilandi: {}"),
+    "location_name": ("city", "✅ Joylashuv nomi yangilandi: {}"),
+    "details": ("details", "✅ Tafsilotlar yangilandi."),
+    "menu_num": ("menu_num", "✅ Menyu raqami yangilandi: {}"),
+    "phone": ("phones", "✅ Telefon raqami yangilandi: {}"),
+    "telegram": ("telegram", "✅ Telegram username yangilandi: {}"),
+    "extra": ("extra", "✅ Qoʻshimcha yangilandi."),
+}
 
-def replace_name_everywhere(old: str, new: str, text: str) -> str:
-    """
-    Faqat boshidagi 🍽️ va <b> tegini ichidagi nomni almashtiradi.
-    Matn ichidagi boshqa holatlarni buzmaysiz.
-    """
-    # 1. <b>ESKI</b> → <b>YANGI</b>
-    text = re.sub(rf"<b>\s*{re.escape(old)}\s*</b>", f"<b>{new}</b>", text, flags=re.I)
-    # 2. 🍽️ ESKI → 🍽️ YANGI (boshida)
-    text = re.sub(rf"^🍽️\s*{re.escape(old)}", f"🍽️ {new}", text, flags=re.I | re.M)
-    return text
+# Kiritma tekshiruvi: mos kelmasa holat saqlanadi va qayta so'raladi
+EDIT_CHECKS = {
+    "menu_num": (re.compile(r"^\d+$"), "❌ Iltimos, faqat raqam kiriting:"),
+    "telegram": (re.compile(r"^@\w{3,}(?:,\s*@\w{3,})*$"),
+                 "❌ Iltimos, to‘g‘ri formatda kiriting (@foydalanuvchi):"),
+}
 
 
 @dp.message(EditDeleteRest.action, F.text)
-async def save_edit_name(message: types.Message, state: FSMContext):
+async def save_edit_field(message: types.Message, state: FSMContext):
     data = await state.get_data()
-    index = data["edit_index"]
+    place_id = data["edit_id"]
     action = data["edit_action"]
     new_value = message.text.strip()
 
-    if action == "name":
-        old_name = PLACES[index]["name"]
-        new_name = new_value
-
-        # 1) PLACES va SQLite dagi nomni yangilaymiz
-        PLACES[index]["name"] = new_name
-        await update_place_field_in_db(PLACES[index]["id"], "name", new_name)
-
-        # 2) Matn ichidagi barcha holatlardagi nomni almashtiramiz
-        for key in ("text_user", "text_channel"):
-            if key in PLACES[index]:
-                PLACES[index][key] = replace_name_everywhere(old_name, new_name, PLACES[index][key])
-                await update_place_field_in_db(PLACES[index]["id"], key, PLACES[index][key])
-
-        await message.answer(f"✅ Restoran nomi va matn ichidagi nom yangilandi: {new_name}")
-
-        # 3) PLACES massividagi elementni to‘liq yangilab chiqamiz
-        await reload_single_place_in_memory(PLACES[index]["id"])
+    if action not in EDIT_ACTIONS:
+        await message.answer(f"✅ {action.capitalize()} yangilandi.")
+        await state.clear()
+        return
 
-    elif action == "location_name_single" or action == "location_name_multi":
-        for key in ('text_user', 'text_channel', 'text'):
-            if key not in PLACES[index]:
-                continue
-            old_text = PLACES[index][key]
-            new_text = re.sub(
-                r'(📍 <a\s+href\s*=\s*["\'][^"\']*["\']\s*>)[^<]*?(</a>)',
-                rf'\g<1>{new_value}\g<2>',
-                old_text,
-                flags=re.IGNORECASE
-            )
-            PLACES[index][key] = new_text
-        await update_place_field_in_db(PLACES[index]["id"], "text_user", PLACES[index]["text_user"])
-        await update_place_field_in_db(PLACES[index]["id"], "text_channel", PLACES[index]["text_channel"])
-        await message.answer(f"✅ Joylashuv nomi yangilandi: {new_value}")
-        await reload_single_place_in_memory(PLACES[index]["id"])
-
-    elif action == "location_name_one":
-        loc_idx = data['loc_idx']
-        txt = PLACES[index]["text"]
-        lines = txt.splitlines()
-        loc_lines = [i for i, ln in enumerate(lines) if ln.strip().startswith("📍")]
-        if loc_idx < len(loc_lines):
-            old_line = lines[loc_lines[loc_idx]]
-            new_line = re.sub(
-                r'(📍\s*<a[^>]*>)[^<]*?(</a>)',
-                rf'\g<1>{new_value}\g<2>',
-                old_line,
-                flags=re.I
-            )
-            lines[loc_lines[loc_idx]] = new_line
-            for key in ('text', 'text_user', 'text_channel'):
-                if key not in PLACES[index]:
-                    continue
-                PLACES[index][key] = "\n".join(lines)
-        await update_place_field_in_db(PLACES[index]["id"], "text_user", PLACES[index]["text_user"])
-        await update_place_field_in_db(PLACES[index]["id"], "text_channel", PLACES[index]["text_channel"])
-        await message.answer(f"✅ {loc_idx + 1}-joylashuv nomi yangilandi: {new_value}")
-        await reload_single_place_in_memory(PLACES[index]["id"])
-
-    elif action == "details":
-        for key in ('text', 'text_user', 'text_channel'):
-            if key not in PLACES[index]:
-                continue
-            PLACES[index][key] = replace_after_location_link(PLACES[index][key], new_value)
-        await update_place_field_in_db(PLACES[index]["id"], "text_user", PLACES[index]["text_user"])
-        await update_place_field_in_db(PLACES[index]["id"], "text_channel", PLACES[index]["text_channel"])
-        await message.answer("✅ Tafsilotlar yangilandi.")
-        await reload_single_place_in_memory(PLACES[index]["id"])
-
-    elif action == "phone":
-        for key in ('text', 'text_user', 'text_channel'):
-            if key not in PLACES[index]:
-                continue
-            PLACES[index][key] = re.sub(
-                r'(📞\s*)[+\d\s()-]+',
-                rf'\g<1>{new_value}\n',
-                PLACES[index][key],
-                flags=re.IGNORECASE
-            )
-        await update_place_field_in_db(PLACES[index]["id"], "text_user", PLACES[index]["text_user"])
-        await update_place_field_in_db(PLACES[index]["id"], "text_channel", PLACES[index]["text_channel"])
-        await message.answer(f"✅ Telefon raqami yangilandi: {new_value}")
-        await reload_single_place_in_memory(PLACES[index]["id"])
-
-    elif action == "telegram":
-        for key in ('text', 'text_user', 'text_channel'):
-            if key not in PLACES[index]:
-                continue
-            PLACES[index][key] = re.sub(
-                r'(📱 Telegram:\s*)@[\w\d_]+',
-                rf'\g<1>{new_value}',
-                PLACES[index][key],
-                flags=re.IGNORECASE
-            )
-        await update_place_field_in_db(PLACES[index]["id"], "text_user", PLACES[index]["text_user"])
-        await update_place_field_in_db(PLACES[index]["id"], "text_channel", PLACES[index]["text_channel"])
-        await message.answer(f"✅ Telegram username yangilandi: {new_value}")
-        await reload_single_place_in_memory(PLACES[index]["id"])
-
-    elif action == "menu_num":
-        for key in ('text', 'text_user', 'text_channel'):
-            if key not in PLACES[index]:
-                continue
-            PLACES[index][key] = re.sub(
-                r'(<a\s+href\s*=\s*["\']https://t\.me/myhalalmenu/)[^"\']+(["\']\s*>Меню</a>)',
-                rf'\g<1>{new_value}\g<2>',
-                PLACES[index][key],
-                flags=re.IGNORECASE
-            )
-        await update_place_field_in_db(PLACES[index]["id"], "text_user", PLACES[index]["text_user"])
-        await update_place_field_in_db(PLACES[index]["id"], "text_channel", PLACES[index]["text_channel"])
-        await message.answer(f"✅ Menyu raqami yangilandi: {new_value}")
-        await reload_single_place_in_memory(PLACES[index]["id"])
-
-    elif action == "extra":
-        for key in ('text', 'text_user', 'text_channel'):
-            if key not in PLACES[index]:
-                continue
-            if re.search(r'^📝 Q.*?shimcha:', PLACES[index][key], flags=re.M):
-                PLACES[index][key] = re.sub(
-                    r'^📝 Q.*?shimcha:.*$',
-                    f'📝 Qoʻshimcha: {new_value}',
-                    PLACES[index][key],
-                    flags=re.M
-                )
-            else:
-                PLACES[index][key] += f'\n📝 Qoʻshimcha: {new_value}'
-        await update_place_field_in_db(PLACES[index]["id"], "text_user", PLACES[index]["text_user"])
-        await update_place_field_in_db(PLACES[index]["id"], "text_channel", PLACES[index]["text_channel"])
-        await message.answer("✅ Qoʻshimcha yangilandi.")
-        await reload_single_place_in_memory(PLACES[index]["id"])
+    check = EDIT_CHECKS.get(action)
+    if check and not check[0].match(new_value):
+        await message.answer(check[1])
+        return
 
+    field, reply = EDIT_ACTIONS[action]
+    fields = {field: new_value}
+    if field == "name":
+        fields["title"] = None           # sarlavha yana nomdan olinadi
+    if await update_place(place_id, **fields) is None:
+        await message.answer("❌ Restoran topilmadi (o'chirilgan bo'lishi mumkin).")
     else:
-        await message.answer(f"✅ {action.capitalize()} yangilandi.")
-
+        await message.answer(reply.format(new_value))
     await state.clear()
 
 
@@ -2243,72 +2474,36 @@ async def save_blacklist_word(message: types.Message, state: FSMContext):
     await message.answer(f"✅ «{word}» qora ro‘yxatga qo‘shildi.")
     await state.clear()
 
-# ---------------- 📍 3 ta joylashuv nomini alohida tahrirlash ----------------
-@dp.callback_query(F.data.startswith("edit_loc_name_"))
-async def pick_location_name_to_edit(call: types.CallbackQuery, state: FSMContext):
-    parts = call.data.split("_")
-    loc_idx = int(parts[3]) - 1  # 0-bazada
-    rest_idx = int(parts[4])
-
-    await state.update_data(edit_index=rest_idx, loc_idx=loc_idx, edit_action="location_name_one")
-    await call.message.answer(f"{loc_idx + 1}-joylashuv uchun yangi nom kiriting:")
-    await state.set_state(EditDeleteRest.action)
-
-
+# ---------------- 📍 joylashuv nomini tahrirlash ----------------
 @dp.callback_query(F.data == "edit_location_names")
 async def prompt_edit_location_names(call: types.CallbackQuery, state: FSMContext):
     await call.answer()
     data = await state.get_data()
-    index = data["edit_index"]
-    place = PLACES[index]
+    place = PLACES.get(data["edit_id"])
 
-    location_names = [
-        line.split("<a href")[0].replace("📍", "").strip()
-        for line in place["text"].splitlines()
-        if line.strip().startswith("📍")
-    ]
-
-    if not location_names:
+    if place is None or not place.city:
         await call.message.answer("📍 Joylashuv nomi topilmadi!")
         return
 
-    # 1 ta bo‘lsa – darhol
-    if len(location_names) == 1:
-        await state.update_data(edit_index=index, loc_idx=0, edit_action="location_name_one")
-        await call.message.answer("Yangi joylashuv nomini kiriting:")
-        await state.set_state(EditDeleteRest.action)
-        return
-
-    # 2+ bo‘lsa – tanlash
-    kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=f"📍 {i}. {name}",
-                              callback_data=f"edit_loc_name_{i}_{index}")]
-        for i, name in enumerate(location_names, 1)
-    ])
-    await call.message.answer("Qaysi joylashuv nomini tahrirlashni xohlaysiz?", reply_markup=kb)
+    await state.update_data(edit_action="location_name")
+    await call.message.answer(f"📍 Hozirgi nom: {place.city}\n\nYangi joylashuv nomini kiriting:")
+    await state.set_state(EditDeleteRest.action)
 
 # ---------------- tahrirlash jarayonida havola yuborilsa ----------------
 @dp.message(EditDeleteRest.waiting_location_link, F.text.contains("maps.app.goo.gl") | F.text.contains("google.com/maps"))
 async def save_edit_location_link(message: types.Message, state: FSMContext):
     new_link = message.text.strip()
     data = await state.get_data()
-    idx = data['edit_index']
+    place_id = data['edit_id']
     
     # 1. Havoladan koordinatalarni olishga urinish
-    lat, lng = parse_gmaps_link(new_link)
+    lat, lng = await parse_gmaps_link(new_link)
     
     # 2. Agar koordinatalar topilmasa, joy nomini aniqlashga urinish
     if lat is None:
         try:
-            # Havolani kengaytirish
-            if "maps.app.goo.gl" in new_link:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                resp = requests.get(new_link, headers=headers, allow_redirects=True, timeout=10)
-                expanded_url = unquote(resp.url)
-            else:
-                expanded_url = unquote(new_link)
+            # Havolani kengaytirish (keshdan – parse_gmaps_link allaqachon kengaytirgan)
+            expanded_url = unquote(await expand_short_url(new_link))
             
             # URL dan joy nomini chiqarib olish (place/ dan /data orasidagi qism)
             place_match = re.search(r'/place/([^/]+)', expanded_url)
@@ -2319,14 +2514,13 @@ async def save_edit_location_link(message: types.Message, state: FSMContext):
             
             # Hali ham topilmasa, matndan joy nomini aniqlash
             if lat is None:
-                # O'zining geolocator'ini yaratish (async thread safe)
-                geolocator = Nominatim(user_agent="halal_bot_location_link")
-                geo = await asyncio.to_thread(
-                    geolocator.geocode,
-                    expanded_url,  # URL ni geocode qilishga urinish (ba'zi geocoderlar bunga qo'llab-quvvatlaydi)
-                    language="en",
-                    timeout=10
-                )
+                await GEO_LIMITS["nominatim"].acquire()
+                async with HTTP.track("nominatim"):
+                    geo = await geolocator_nom.geocode(
+                        expanded_url,  # URL ni geocode qilishga urinish (ba'zi geocoderlar bunga qo'llab-quvvatlaydi)
+                        language="en",
+                        timeout=PROVIDER_TIMEOUTS["nominatim"]
+                    )
                 if geo and "united states" in geo.address.lower():
                     lat, lng = geo.latitude, geo.longitude
                     
@@ -2344,28 +2538,11 @@ async def save_edit_location_link(message: types.Message, state: FSMContext):
         )
         return
 
-    # SQLite + PLACES yangilash
-    PLACES[idx]["lat"] = lat
-    PLACES[idx]["lng"] = lng
-    await update_place_field_in_db(PLACES[idx]["id"], "lat", lat)
-    await update_place_field_in_db(PLACES[idx]["id"], "lng", lng)
-
-    # Matndagi havolani almashtirish
-    for key in ('text_user', 'text_channel'):
-        if key not in PLACES[idx]:
-            continue
-        old = PLACES[idx][key]
-        # Havolani almashtirish (barcha xavfsizlik belgilari bilan)
-        new = re.sub(
-            r'(📍\s*<a\s+href\s*=\s*["\'])[^"\']*(["\'][^>]*>[^<]*</a>)',
-            rf'\g<1>{new_link}\g<2>',
-            old,
-            flags=re.I
-        )
-        PLACES[idx][key] = new
-        await update_place_field_in_db(PLACES[idx]["id"], key, new)
-
-    await reload_single_place_in_memory(PLACES[idx]["id"])
+    # Koordinata va havola bitta UPDATE da; eski va yangi nuqtadagi javoblar eskiradi
+    if await update_place(place_id, lat=lat, lng=lng, map_link=new_link) is None:
+        await message.answer("❌ Restoran topilmadi (o'chirilgan bo'lishi mumkin).")
+        await state.clear()
+        return
     await message.answer(
         f"✅ Joylashuv havolasi yangilandi:\n"
         f"📍 {new_link}\n"
@@ -2375,89 +2552,18 @@ async def save_edit_location_link(message: types.Message, state: FSMContext):
 
 
 
-@dp.message(EditDeleteRest.action, F.text)
-async def save_edit_location_name(message: types.Message, state: FSMContext):
-    data = await state.get_data()
-    idx = data['edit_index']
-    new_name = message.text.strip()
-
-    for key in ('text', 'text_user', 'text_channel'):
-        if key not in PLACES[idx]:
-            continue
-
-        old_text = PLACES[idx][key]
-        # 📍 <a href="...">ESKI_NOM</a> → 📍 <a href="...">YANGI_NOM</a>
-        new_text = re.sub(
-            r'(📍 <a\s+href\s*=\s*["\'][^"\']*["\']\s*>)[^<]*?(</a>)',
-            rf'\g<1>{new_name}\g<2>',
-            old_text,
-            flags=re.IGNORECASE
-        )
-        PLACES[idx][key] = new_text
-
-
-    await message.answer(f"✅ Joylashuv nomi yangilandi: {new_name}")
-    await update_place_field_in_db(PLACES[idx]["id"], "text_user",  PLACES[idx]["text_user"])
-    await update_place_field_in_db(PLACES[idx]["id"], "text_channel", PLACES[idx]["text_channel"])
-    await reload_single_place_in_memory(PLACES[idx]["id"])   # ← qo‘shing
-    await state.clear()
-
-def extract_links(text: str) -> list[str]:
-    return re.findall(r'<a href="([^"]+)"', text)
-
-
 # ---------------- location-link ni tahrirlash ----------------
 @dp.callback_query(F.data.startswith("edit_location_links_"))
 async def prompt_edit_location_links(call: types.CallbackQuery, state: FSMContext):
-    edit_index = int(call.data.split("_")[-1])
-    place = PLACES[edit_index]
-
-    txt = place.get("text_user", place.get("text_channel", place.get("text", "")))
-    links = extract_location_links(txt)
+    place = PLACES.get(int(call.data.split("_")[-1]))
 
-    if not links:
+    if place is None or not place.map_link:
         await call.answer("📍 Joylashuv havolasi topilmadi!", show_alert=True)
         return
 
-    await state.update_data(edit_index=edit_index)
-
-    # 1 ta bo‘lsa – darhol
-    if len(links) == 1:
-        await state.set_state(EditDeleteRest.waiting_location_link)
-        await call.message.answer(f"🔗 Hozirgi havola:\n{links[0]}\n\nYangi havolani yuboring:")
-        return
-
-    # 2+ bo‘lsa – tanlash
-    kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=f"🔗 {i}. {link[:30]}...",
-                              callback_data=f"edit_location_link_{i}_{edit_index}")]
-        for i, link in enumerate(links, 1)
-    ])
-    await call.message.answer("Qaysi havolani tahrirlaysiz?", reply_markup=kb)
-
-@dp.callback_query(F.data.startswith("edit_location_link_"))
-async def select_location_link_to_edit(call: types.CallbackQuery, state: FSMContext):
-    parts = call.data.split("_")
-    idx = int(parts[3])          # havola indeksi (1-bazada)
-    index = int(parts[4])        # restoran indeksi (0-bazada)
-
-    await state.update_data(edit_index=index, location_idx=idx)
-    await state.set_state(EditDeleteRest.waiting_location_link)  # ← NEW
-    await call.message.answer("Yangi joylashuv havolasini yuboring:")
-
-
-def extract_location_links(text: str) -> list[str]:
-    """
-    📍 bilan boshlangan qatordagi barcha <a href="..." / '...'> havolalarini qaytaradi.
-    """
-    links = []
-    for line in text.splitlines():
-        line = line.strip()
-        if line.startswith("📍"):
-            # href="..." yoki href='...'  ikkala tirnoqni ham qo‘llab o‘tamiz
-            found = re.findall(r'<a\s+href\s*=\s*(["\'])(.*?)\1', line, flags=re.I)
-            links.extend([url for _, url in found])
-    return links
+    await state.update_data(edit_id=place.id)
+    await state.set_state(EditDeleteRest.waiting_location_link)
+    await call.message.answer(f"🔗 Hozirgi havola:\n{place.map_link}\n\nYangi havolani yuboring:")
 
 
 @dp.callback_query(F.data == "edit_details")
@@ -2467,48 +2573,6 @@ async def prompt_edit_details(call: types.CallbackQuery, state: FSMContext):
     await state.update_data(edit_action="details")
 
 
-@dp.message(EditDeleteRest.action, F.text)
-async def save_edit_details(message: types.Message, state: FSMContext):
-    idx = (await state.get_data())['edit_index']
-    new_details = message.text.strip()
-
-    for key in ('text', 'text_user', 'text_channel'):
-        if key not in PLACES[idx]:
-            continue
-        PLACES[idx][key] = replace_after_location_link(PLACES[idx][key], new_details)
-    await message.answer("✅ Tafsilotlar yangilandi.")
-    await update_place_field_in_db(PLACES[idx]["id"], "text_user",  PLACES[idx]["text_user"])
-    await update_place_field_in_db(PLACES[idx]["id"], "text_channel", PLACES[idx]["text_channel"])
-    await reload_single_place_in_memory(PLACES[idx]["id"])   # ← qo‘shing
-    await state.clear()
-
-def replace_after_location_link(html: str, new_details: str) -> str:
-    """
-    📍 ... </a> dan keyingi matnni 📋 (yoki 🌐) gacha bo‘lgan qismni
-    to‘liq yangi tafsilotlar bilan almashtiradi.
-    """
-    # 1-variant: 📋 bilan tugaydi
-    if re.search(r'📍.*?</a>\s*\n.*?\n📋', html, flags=re.S):
-        return re.sub(
-            r'(📍.*?</a>)\s*\n.*?\n(📋)',
-            rf'\1\n{new_details}\n\2',
-            html,
-            flags=re.S
-        )
-    # 2-variant: 🌐 bilan tugaydi
-    if re.search(r'📍.*?</a>\s*\n.*?\n🌐', html, flags=re.S):
-        return re.sub(
-            r'(📍.*?</a>)\s*\n.*?\n(🌐)',
-            rf'\1\n{new_details}\n\2',
-            html,
-            flags=re.S
-        )
-    # 3-variant: hech qanday belgi yo‘q – oxiriga qo‘shamiz
-    return html
-
-
-
-
 @dp.callback_query(F.data == "edit_menu_num")
 async def prompt_edit_menu_num(call: types.CallbackQuery, state: FSMContext):
     await call.message.answer("📝 Yangi menyu raqamini kiriting (faqat raqam):")
@@ -2517,93 +2581,18 @@ async def prompt_edit_menu_num(call: types.CallbackQuery, state: FSMContext):
 
 
 
-@dp.message(EditDeleteRest.action, F.text.regexp(r'^\d+$'))
-async def save_edit_menu_num(message: types.Message, state: FSMContext):
-    idx = (await state.get_data())['edit_index']
-    new_num = message.text.strip()
-
-    for key in ('text', 'text_user', 'text_channel'):
-        if key not in PLACES[idx]:
-            continue
-        # 🌐 yoki 📋 bilan boshlangan havolani topamiz
-        PLACES[idx][key] = re.sub(
-            r'(<a\s+href\s*=\s*["\']https://t\.me/myhalalmenu/)[^"\']+(["\']\s*>Меню</a>)',
-            rf'\g<1>{new_num}\g<2>',
-            PLACES[idx][key],
-            flags=re.IGNORECASE
-        )
-
-
-    await message.answer(f"✅ Menyu raqami yangilandi: {new_num}")
-    await update_place_field_in_db(PLACES[idx]["id"], "text_user",  PLACES[idx]["text_user"])
-    await update_place_field_in_db(PLACES[idx]["id"], "text_channel", PLACES[idx]["text_channel"])
-    await reload_single_place_in_memory(PLACES[idx]["id"])   # ← qo‘shing
-    await state.clear()
-
-
 @dp.callback_query(F.data == "edit_phone")
 async def prompt_edit_phone(call: types.CallbackQuery, state: FSMContext):
     await call.message.answer("📞 Yangi telefon raqamini kiriting:")
     await state.set_state(EditDeleteRest.action)
     await state.update_data(edit_action="phone")
 
-@dp.message(EditDeleteRest.action, F.text)
-async def save_edit_phone(message: types.Message, state: FSMContext):
-    idx = (await state.get_data())['edit_index']
-    new_p = message.text.strip()
-
-    for key in ('text', 'text_user', 'text_channel'):
-        if key not in PLACES[idx]:
-            continue
-        # 📞 ...  (ikkitalik raqam ham bo‘lishi mumkin)
-        PLACES[idx][key] = re.sub(
-            r'📞\s*[+\d\s–()-]+',
-            f'📞 {new_p}',
-            PLACES[idx][key],
-            flags=re.M
-        )
-
-
-    await message.answer(f"✅ Telefon raqami yangilandi: {new_p}")
-    await update_place_field_in_db(PLACES[idx]["id"], "text_user",  PLACES[idx]["text_user"])
-    await update_place_field_in_db(PLACES[idx]["id"], "text_channel", PLACES[idx]["text_channel"])
-    await reload_single_place_in_memory(PLACES[idx]["id"])   # ← qo‘shing
-    await state.clear()
-
 @dp.callback_query(F.data == "edit_telegram")
 async def prompt_edit_telegram(call: types.CallbackQuery, state: FSMContext):
     await call.message.answer("📱 Yangi Telegram usernameni kiriting (@sizning_user shaklida):")
     await state.set_state(EditDeleteRest.action)
     await state.update_data(edit_action="telegram")
 
-@dp.message(EditDeleteRest.action, F.text)
-async def save_edit_telegram(message: types.Message, state: FSMContext):
-    idx = (await state.get_data())['edit_index']
-    new_u = message.text.strip()
-
-    # format tekshiruvi
-    if not re.match(r'^@\w{3,}$', new_u):
-        await message.answer("❌ Iltimos, to‘g‘ri formatda kiriting (@foydalanuvchi):")
-        return
-
-    for key in ('text', 'text_user', 'text_channel'):
-        if key not in PLACES[idx]:
-            continue
-        # 📱 Telegram: ... (bir qator)
-        PLACES[idx][key] = re.sub(
-            r'📱 Telegram:\s*@\w+(?:,\s*@\w+)*',
-            f'📱 Telegram: {new_u}',
-            PLACES[idx][key],
-            flags=re.M | re.I
-        )
-
-
-    await message.answer(f"✅ Telegram username yangilandi: {new_u}")
-    await update_place_field_in_db(PLACES[idx]["id"], "text_user",  PLACES[idx]["text_user"])
-    await update_place_field_in_db(PLACES[idx]["id"], "text_channel", PLACES[idx]["text_channel"])
-    await reload_single_place_in_memory(PLACES[idx]["id"])   # ← qo‘shing
-    await state.clear()
-
 # ---------------- 📝 Qo'shimcha tahrirlash ----------------
 @dp.callback_query(F.data == "edit_extra")
 async def prompt_edit_extra(call: types.CallbackQuery, state: FSMContext):
@@ -2612,42 +2601,14 @@ async def prompt_edit_extra(call: types.CallbackQuery, state: FSMContext):
     await state.set_state(EditDeleteRest.action)
     await state.update_data(edit_action="extra")
 
-@dp.message(EditDeleteRest.action, F.text)
-async def save_edit_extra(message: types.Message, state: FSMContext):
-    idx = (await state.get_data())['edit_index']
-    new_e = message.text.strip()
-
-    for key in ('text', 'text_user', 'text_channel'):
-        if key not in PLACES[idx]:
-            continue
-        if re.search(r'^📝 Q.*?shimcha:', PLACES[idx][key], flags=re.M):
-            PLACES[idx][key] = re.sub(
-                r'^📝 Q.*?shimcha:.*$',
-                f'📝 Qoʻshimcha: {new_e}',
-                PLACES[idx][key],
-                flags=re.M
-            )
-        else:
-            PLACES[idx][key] += f'\n📝 Qoʻshimcha: {new_e}'
-
-    # SQLite ga yozamiz
-    await update_place_field_in_db(PLACES[idx]["id"], "text_user", PLACES[idx]["text_user"])
-    await update_place_field_in_db(PLACES[idx]["id"], "text_channel", PLACES[idx]["text_channel"])
-
-    await message.answer("✅ Qoʻshimcha yangilandi.")
-    await reload_single_place_in_memory(PLACES[idx]["id"])   # ← qo‘shing
-    await state.clear() 
-
-
 # ---------------- o'chirish ----------------
 @dp.callback_query(F.data.startswith("delete_"))
 async def confirm_delete_rest(call: types.CallbackQuery, state: FSMContext):
     await call.answer()
-    index = int(call.data.split("_")[1])
-    if 0 <= index < len(PLACES):
-        place = PLACES[index]
+    place = PLACES.get(int(call.data.split("_")[1]))
+    if place is not None:
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🗑️ O'chirish", callback_data=f"confirm_delete_{index}")],
+            [InlineKeyboardButton(text="🗑️ O'chirish", callback_data=f"confirm_delete_{place.id}")],
             [InlineKeyboardButton(text="❌ Bekor qilish", callback_data="cancel_delete")]
         ])
         display_text = get_display_text(place)
@@ -2657,12 +2618,13 @@ async def confirm_delete_rest(call: types.CallbackQuery, state: FSMContext):
 
 @dp.callback_query(F.data.startswith("confirm_delete_"))
 async def confirm_delete_rest_final(call: types.CallbackQuery, state: FSMContext):
-    index = int(call.data.split("_")[2])
-    if 0 <= index < len(PLACES):
-        place = PLACES.pop(index)
-        # SQLite dan ham o‘chiramiz
-        await delete_place_from_db(place["id"])
-        await call.message.edit_text(f"✅ {place['name']} o'chirildi.")
+    place = PLACES.remove(int(call.data.split("_")[2]))
+    if place is not None:
+        PLACE_INDEX.remove(place.id)
+        invalidate_responses_near(place.lat, place.lng)
+        # PostgreSQL dan ham o‘chiramiz
+        await delete_place_from_db(place.id)
+        await call.message.edit_text(f"✅ {place.name} o'chirildi.")
     else:
         await call.message.edit_text("❌ Noto‘g‘ri raqam.")
     await state.clear()
@@ -2683,11 +2645,12 @@ async def start_swap(call: types.CallbackQuery, state: FSMContext):
 @dp.message(SwapLocation.waiting_first, F.text.isdigit)
 async def got_first_number(message: types.Message, state: FSMContext):
     first = int(message.text)
-    if not (1 <= first <= len(PLACES)):
+    place = PLACES.at(first)
+    if place is None:
         await message.answer("❌ Bunday raqam mavjud emas. Qayta kiriting:")
         return
-    await state.update_data(first=first)
-    await message.answer(f"✅ Tanlandi: <b>{PLACES[first-1]['name']}</b>\n\n"
+    await state.update_data(first=first, first_id=place.id)
+    await message.answer(f"✅ Tanlandi: <b>{place.name}</b>\n\n"
                          "2️⃣ <b>Ikkinchi restoran raqamini kiriting</b> (qaysi raqamga koʻchirish kerak):")
     await state.set_state(SwapLocation.waiting_second)
 
@@ -2697,26 +2660,28 @@ async def got_second_number(message: types.Message, state: FSMContext):
     data = await state.get_data()
     first = data["first"]
 
-    if not (1 <= second <= len(PLACES)):
+    p1, p2 = PLACES.get(data["first_id"]), PLACES.at(second)
+    if p1 is None or p2 is None:
         await message.answer("❌ Bunday raqam mavjud emas. Qayta kiriting:")
         return
-    if first == second:
+    if p1.id == p2.id:
         await message.answer("❌ Xuddi shu raqam! Qayta kiriting:")
         return
 
-    # 0-bazadagi indekslar
-    idx1, idx2 = first - 1, second - 1
-    p1, p2 = PLACES[idx1], PLACES[idx2]
-
     # DB da almashtirish
-    success = await swap_places_in_db(p1["id"], p2["id"])
+    success = await swap_places_in_db(p1.id, p2.id)
     
     if success:
-        # Memory da almashtirish
-        p1["text_user"], p2["text_user"] = p2["text_user"], p1["text_user"]
-        p1["text_channel"], p2["text_channel"] = p2["text_channel"], p1["text_channel"]
-        p1["text"], p2["text"] = p2["text"], p1["text"]
-        p1["name"], p2["name"] = p2["name"], p1["name"]
+        # Memory da almashtirish (id va koordinata joyida qoladi)
+        content = ("name", *PLACE_FIELDS)
+        new1 = p1.replace(**{key: p2[key] for key in content})
+        new2 = p2.replace(**{key: p1[key] for key in content})
+        PLACES.put(new1)
+        PLACES.put(new2)
+        PLACE_INDEX.add(new1)
+        PLACE_INDEX.add(new2)
+        invalidate_responses_near(p1.lat, p1.lng)
+        invalidate_responses_near(p2.lat, p2.lng)
 
         await message.answer(
             f"✅ <b>{first}</b> va <b>{second}</b> oʻrinlari muvaffaqiyatli almashdi!\n"
@@ -2765,8 +2730,8 @@ def is_ad(text: str) -> bool:
 
     return False
 def get_display_text(place):
-    # Avval "text_user", keyin "text_channel", keyin esa eski "text" kalitini qidiradi
-    return place.get("text_user", place.get("text_channel", place.get("text", "")))
+    # Matn shablondan (Place.text_user, keshlangan)
+    return place.text_user
 
 
 def split_text(text: str, limit: int = 4000) -> list[str]:
@@ -2784,12 +2749,7 @@ def split_text(text: str, limit: int = 4000) -> list[str]:
 
 async def reply_long_text(message: types.Message, text: str) -> None:
     """Katta matnni 4000 belgi bo‘laklama, reply qilib yuboradi."""
-    for part in split_text(text, limit=4000):
-        await message.answer(
-            part,
-            reply_to_message_id=message.message_id,
-            disable_web_page_preview=True
-        )
+    await reply_parts(message, split_text(text, limit=4000))
 
 @dp.message(F.content_type == "location")
 async def location_handler(message: types.Message):
@@ -2798,24 +2758,17 @@ async def location_handler(message: types.Message):
 
 async def by_location(message: types.Message):
     lat, lng = message.location.latitude, message.location.longitude
-    near = [p for p in PLACES if haversine(lat, lng, p["lat"], p["lng"]) <= 100]
-    if not near:
-        await message.answer(
+    chunks = render_places_near(lat, lng)
+    if not chunks:
+        await reply_parts(message, [
             "📍 100 km radiusda hech qanday muassasa yo'q.\n"
             "📍 There are no establishments within 100 km radius.\n"
-            "📍 В радиусе 100 км нет никаких заведений.",
-            reply_to_message_id=message.message_id
-        )
+            "📍 В радиусе 100 км нет никаких заведений."
+        ])
         return
 
-    out = "\n\n".join(get_display_text(p) for p in near)
-    # uzun bo‘lsa bo‘laklama yuboramiz
-    for part in split_text(out):
-        await message.answer(
-            part,
-            reply_to_message_id=message.message_id,
-            disable_web_page_preview=True
-        )
+    # uzun bo‘lsa bo‘laklama yuboramiz (bo‘laklar keshdan tayyor keladi)
+    await reply_parts(message, chunks)
 # ---------------- guruhda joylashuvga o‘xshash matnmi? ----------------
 
 # ---------- REKLAMA (is_ad) ----------
@@ -2862,6 +2815,148 @@ def strip_greeting(text: str) -> str:
     t = re.sub(r'[.?]*(bormi|есть|exist|available)\s*$', '', t, flags=re.I)
     return t.strip()
 
+# ---------- 0. Lokal gazetteer (tarmoqsiz) ----------
+import csv
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GAZETTEER_PATH = os.path.join(BASE_DIR, "data", "us_gazetteer.csv")
+
+# Oddiy so'z ham bo'lishi mumkin bo'lgan nomlar – faqat shtat bilan birga
+# («mobile al») yoki xabar faqat shu nomdan iborat bo'lsa qabul qilinadi
+GAZ_AMBIGUOUS = {
+    "mobile", "reading", "orange", "independence", "bend", "sunrise",
+    "plantation", "wellington", "norman", "corona", "sparks", "lynn",
+    "bryan", "warren", "lawrence", "temple", "gary", "eugene", "tyler",
+    "jackson", "madison", "lincoln", "henderson", "chandler", "gilbert",
+    "flint", "butte", "elizabeth", "edison", "irving", "providence",
+    "hollywood", "odessa", "cambridge", "manchester", "birmingham",
+    "vancouver", "columbia", "salem", "aurora", "erie",
+}
+
+# O'zbekcha / ruscha qo'shimchalar: «chicagoda», «denverga», «в далласе»
+GAZ_SUFFIXES = (
+    "dagi", "daman", "dasiz", "dami", "dan", "da", "ga", "ka", "qa",
+    "ning", "ni", "ом", "е", "а", "у",
+)
+
+
+def gaz_tokens(text: str) -> list[str]:
+    """Kichik harf, tinish belgilarisiz so'zlar ro'yxati"""
+    return re.findall(r"\w+", text.casefold())
+
+
+def gaz_stems(token: str) -> list[str]:
+    """So'zning o'zi va qo'shimchasiz variantlari"""
+    out = [token]
+    for suf in GAZ_SUFFIXES:
+        if token.endswith(suf) and len(token) - len(suf) >= 2:
+            out.append(token[: -len(suf)])
+    return out
+
+
+class Gazetteer:
+    """
+    AQSh shaharlari, shtatlari va taxalluslari.
+    Kalit – normallashtirilgan nom, qiymat – (kanonik nom, lat, lng, aholi, shtat kodi, shahar?)
+    """
+
+    def __init__(self):
+        self.names: dict[str, list[tuple]] = {}
+        self.states: dict[str, str] = {}     # «texas» / «tx» → «TX»
+        self.tokens: set[str] = set()          # nomlardagi barcha so'zlar
+        self.max_words = 1
+
+    def add(self, name: str, entry: tuple):
+        key = " ".join(gaz_tokens(name))
+        if not key:
+            return
+        bucket = self.names.setdefault(key, [])
+        if entry not in bucket:
+            bucket.append(entry)
+            # shahar shtatdan oldin, keyin aholi bo'yicha
+            bucket.sort(key=lambda e: (not e[5], -e[3]))
+        self.tokens.update(key.split())
+        self.max_words = max(self.max_words, key.count(" ") + 1)
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        gaz = cls()
+        for code, full in STATE_CODES.items():
+            gaz.states[code] = code.upper()
+            gaz.states[full] = code.upper()
+        try:
+            with open(path, encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    is_city = row["kind"] == "city"
+                    state = row["state"]
+                    canonical = f"{row['name']}, {state}" if is_city else row["name"]
+                    entry = (canonical, float(row["lat"]), float(row["lng"]),
+                             int(row["population"]), state, is_city)
+                    gaz.add(row["name"], entry)
+                    for alias in filter(None, row["aliases"].split("|")):
+                        gaz.add(alias, entry)
+                    if not is_city:
+                        gaz.states[" ".join(gaz_tokens(row["name"]))] = state
+        except OSError as e:
+            print(f"Gazetteer yuklanmadi: {e}")
+        return gaz
+
+    def _state_at(self, tokens: list[str], i: int) -> tuple[str | None, int]:
+        """tokens[i:] boshidagi shtat (kod yoki to'liq nom) va so'zlar soni"""
+        for n in (2, 1):
+            if i + n > len(tokens):
+                continue
+            head, last = tokens[i:i + n - 1], tokens[i + n - 1]
+            for stem in gaz_stems(last):
+                state = self.states.get(" ".join(head + [stem]))
+                if state:
+                    return state, n
+        return None, 0
+
+    def _match_at(self, tokens: list[str], i: int):
+        """tokens[i] dan boshlanuvchi eng uzun nom: (n, yozuvlar)"""
+        for n in range(min(self.max_words, len(tokens) - i), 0, -1):
+            head, last = tokens[i:i + n - 1], tokens[i + n - 1]
+            for stem in gaz_stems(last):
+                if len(stem) < 2:
+                    continue
+                entries = self.names.get(" ".join(head + [stem]))
+                if entries:
+                    return n, entries
+        return 0, None
+
+    def resolve(self, text: str) -> tuple[str, float, float] | None:
+        """Matndagi eng ishonchli joy: (kanonik nom, lat, lng) yoki None"""
+        tokens = gaz_tokens(text)
+        best, best_rank = None, None
+        unknown_city = False        # «Columbia MD» kabi – bizda yo'q shahar
+        i = 0
+        while i < len(tokens):
+            n, entries = self._match_at(tokens, i)
+            if not entries:
+                i += 1
+                continue
+            key = " ".join(tokens[i:i + n])
+            qualifier, q_len = self._state_at(tokens, i + n)
+            if qualifier and entries[0][5]:
+                entries = [e for e in entries if e[4] == qualifier]
+                unknown_city = unknown_city or not entries
+            elif key in GAZ_AMBIGUOUS and n != len(tokens):
+                entries = None
+            if entries:
+                e = entries[0]
+                rank = (e[5], qualifier is not None, n, e[3])
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = e, rank
+            i += n + q_len
+        if best is None or (unknown_city and not best[5]):
+            return None
+        return best[0], best[1], best[2]
+
+
+GAZETTEER = Gazetteer.load(GAZETTEER_PATH)
+
+
 # ---------- 1. OpenAI funksiyasi ----------
 async def ai_normalize(text: str) -> str:
     t = strip_greeting(text).strip().lower()
@@ -2890,24 +2985,128 @@ async def coords_from_any(text: str):
     """
     «City, State, USA» shakliga keltirib, koordinatani topadi.
     """
+    # 0) lokal gazetteer – tarmoqsiz
+    hit = GAZETTEER.resolve(text)
+    if hit:
+        return hit[1], hit[2]
+
     # 1) qisqa nomlarni to‘ldirish (siz allaqachon yozib qo‘ygansiz)
     t = await ai_normalize(text)
+    hit = GAZETTEER.resolve(t)
+    if hit:
+        return hit[1], hit[2]
 
     # 2) geocoder
     lat, lng = await geocode_with_retry(t)
     return lat, lng
 
-# ---------- 4a. AI dan oldin «matndan shahar» ajratuvchi qo‘shimcha ----------
-# CITY_PAT ni quyidagi ko'rinishda yangilang
-CITY_PAT = re.compile(
-    r'\b(' + '|'.join(
-        # 1) 50 shtat nomlari
-        'alabama|alaska|arizona|arkansas|california|colorado|connecticut|delaware|florida|georgia|hawaii|idaho|illinois|indiana|iowa|kansas|kentucky|louisiana|maine|maryland|massachusetts|michigan|minnesota|mississippi|missouri|montana|nebraska|nevada|new hampshire|new jersey|new mexico|new york|north carolina|north dakota|ohio|oklahoma|oregon|pennsylvania|rhode island|south carolina|south dakota|tennessee|texas|utah|vermont|virginia|washington|west virginia|wisconsin|wyoming|'
-        # 2) eng mashhur shaharlar (kichik harflarda)
-        'ontario|sacramento|los angeles|chicago|houston|phoenix|philadelphia|san antonio|san diego|dallas|san jose|austin|jacksonville|fort worth|columbus|charlotte|san francisco|indianapolis|seattle|denver|washington|boston|el paso|detroit|nashville|portland|oklahoma city|las vegas|louisville|baltimore|milwaukee|albuquerque|tucson|fresno|mesa|kansas city|atlanta|omaha|colorado springs|raleigh|miami|virginia beach|oakland|minneapolis|tulsa|arlington|wichita|bakersfield|tampa|aurora|anaheim|honolulu|riverside|corpus christi|lexington|stockton|henderson|saint paul|st paul|cincinnati|pittsburgh|greensboro|anchorage|plano|lincoln|orlando|irvine|newark|toledo|durham|chula vista|fort wayne|jersey city|st petersburg|norfolk|laredo|winston salem|chandler|madison|lubbock|scottsdale|reno|gilbert|glendale|buffalo|north las vegas|chesapeake|garland|baton rouge|irving|hialeah|richmond|fremont|boise|spokane|des moines|modesto|fayetteville|tacoma|oxnard|fontana|columbus ga|montgomery|moreno valley|shreveport|aurora il|yonkers|akron|augusta|grand rapids|little rock|amarillo|huntington beach|glendale az|overland park|aurora co|tallahassee|mobile|grand prairie|columbus ga|vancouver|knoxville|brownsville|providence|fort lauderdale|salt lake city|santa clarita|newport news|springfield mo|jackson ms|santa rosa|pembroke pines|elk grove|salem|rancho cucamonga|eugene|oceanside|clarksville|garden grove|lancaster ca|springfield il|corona|hayward|palmdale|lakewood co|springfield ma|salinas|alexandria va|paterson|sunnyvale|hollywood|joliet|kansas|kansas city|san bernardino|ontario ca|ontario|tempe|escondido|bridgeport|orange|warren mi|cary nc|fullerton|cedar rapids|dayton|sterling heights|new haven|topeka|columbia sc|thousand oaks|el monte|norman|vallejo|thorton|independence|ann arbor|hartford|wichita falls|fairfield ca|berkeley|cambridge|clearwater|peoria|lansing|westminster|downey|waterbury|costa mesa|manchester nh|miami gardens|manchester ct|west jordan|round rock|gainesville|elgin|charleston sc|murfreesboro|league city|north charleston|beaumont|portsmouth|billings|west covina|arvada|fairfield oh|wichita|lowell|ventura|pueblo|daly city|burbank|richardson|erie|rialto|boulder|west palm beach|broken arrow|pearland|lakeland fl|santa maria|lewisville|south bend|lakewood wa|rochester mn|dearborn|roswell|lee summit|new bedford|inglewood|lee\'s summit|federal way|roanoke|portsmouth|lynn|lawrence ks|santa fe|davie|fall river|reading|livonia|college station|miami beach|rochester hills|sandy springs|sparks|boca raton|wellington|compton|sunrise|plantation|greeley|mcallen|brookhaven|albany ny|kalamazoo|nampa|bryan|bend|davie|boca raton|deltona|racine|rogers ar|rogers|janesville|westland|sioux falls|champaign|dekalb|fargo|utica|suffolk|clovis|roanoke|kenosha|appleton|duluth|lynchburg|kalamazoo|bloomington in|bloomington|renton|redlands|st charles|st cloud|st george|st joseph|st louis|st petersburg|st paul|st peters|st clair shores|st charles mo|st cloud mn|st joseph mo|st louis mo|st peters mo'
-    ) + r')\b',
-    flags=re.I
+# ---------- 4a. AI dan oldin «matndan shahar» – tezkor yo'l ----------
+# Shtatlar va mashhur shaharlar (kichik harflarda); takrorlar CityMatcher'da tushib qoladi
+CITY_TERMS = (
+    # 1) 50 shtat nomlari
+    'alabama|alaska|arizona|arkansas|california|colorado|connecticut|delaware|florida|georgia|hawaii|idaho|illinois|indiana|iowa|kansas|kentucky|louisiana|maine|maryland|massachusetts|michigan|minnesota|mississippi|missouri|montana|nebraska|nevada|new hampshire|new jersey|new mexico|new york|north carolina|north dakota|ohio|oklahoma|oregon|pennsylvania|rhode island|south carolina|south dakota|tennessee|texas|utah|vermont|virginia|washington|west virginia|wisconsin|wyoming|'
+    # 2) eng mashhur shaharlar (kichik harflarda)
+    'ontario|sacramento|los angeles|chicago|houston|phoenix|philadelphia|san antonio|san diego|dallas|san jose|austin|jacksonville|fort worth|columbus|charlotte|san francisco|indianapolis|seattle|denver|washington|boston|el paso|detroit|nashville|portland|oklahoma city|las vegas|louisville|baltimore|milwaukee|albuquerque|tucson|fresno|mesa|kansas city|atlanta|omaha|colorado springs|raleigh|miami|virginia beach|oakland|minneapolis|tulsa|arlington|wichita|bakersfield|tampa|aurora|anaheim|honolulu|riverside|corpus christi|lexington|stockton|henderson|saint paul|st paul|cincinnati|pittsburgh|greensboro|anchorage|plano|lincoln|orlando|irvine|newark|toledo|durham|chula vista|fort wayne|jersey city|st petersburg|norfolk|laredo|winston salem|chandler|madison|lubbock|scottsdale|reno|gilbert|glendale|buffalo|north las vegas|chesapeake|garland|baton rouge|irving|hialeah|richmond|fremont|boise|spokane|des moines|modesto|fayetteville|tacoma|oxnard|fontana|columbus ga|montgomery|moreno valley|shreveport|aurora il|yonkers|akron|augusta|grand rapids|little rock|amarillo|huntington beach|glendale az|overland park|aurora co|tallahassee|mobile|grand prairie|columbus ga|vancouver|knoxville|brownsville|providence|fort lauderdale|salt lake city|santa clarita|newport news|springfield mo|jackson ms|santa rosa|pembroke pines|elk grove|salem|rancho cucamonga|eugene|oceanside|clarksville|garden grove|lancaster ca|springfield il|corona|hayward|palmdale|lakewood co|springfield ma|salinas|alexandria va|paterson|sunnyvale|hollywood|joliet|kansas|kansas city|san bernardino|ontario ca|ontario|tempe|escondido|bridgeport|orange|warren mi|cary nc|fullerton|cedar rapids|dayton|sterling heights|new haven|topeka|columbia sc|thousand oaks|el monte|norman|vallejo|thorton|independence|ann arbor|hartford|wichita falls|fairfield ca|berkeley|cambridge|clearwater|peoria|lansing|westminster|downey|waterbury|costa mesa|manchester nh|miami gardens|manchester ct|west jordan|round rock|gainesville|elgin|charleston sc|murfreesboro|league city|north charleston|beaumont|portsmouth|billings|west covina|arvada|fairfield oh|wichita|lowell|ventura|pueblo|daly city|burbank|richardson|erie|rialto|boulder|west palm beach|broken arrow|pearland|lakeland fl|santa maria|lewisville|south bend|lakewood wa|rochester mn|dearborn|roswell|lee summit|new bedford|inglewood|lee\'s summit|federal way|roanoke|portsmouth|lynn|lawrence ks|santa fe|davie|fall river|reading|livonia|college station|miami beach|rochester hills|sandy springs|sparks|boca raton|wellington|compton|sunrise|plantation|greeley|mcallen|brookhaven|albany ny|kalamazoo|nampa|bryan|bend|davie|boca raton|deltona|racine|rogers ar|rogers|janesville|westland|sioux falls|champaign|dekalb|fargo|utica|suffolk|clovis|roanoke|kenosha|appleton|duluth|lynchburg|kalamazoo|bloomington in|bloomington|renton|redlands|st charles|st cloud|st george|st joseph|st louis|st petersburg|st paul|st peters|st clair shores|st charles mo|st cloud mn|st joseph mo|st louis mo|st peters mo'
+).split('|')
+
+
+class CityMatcher:
+    """
+    CITY_TERMS bo'yicha token-trie: matndagi har bir so'z uchun bitta dict qadami.
+    Topilgan nom gazetteer orqali oldindan kanonik «City, ST» va koordinataga bog'langan.
+    """
+    _END = ""
+
+    def __init__(self, gaz: Gazetteer):
+        self.gaz = gaz
+        self.root: dict = {}
+        self.size = 0
+
+    @classmethod
+    def build(cls, terms, gaz: Gazetteer) -> "CityMatcher":
+        m = cls(gaz)
+        for term in dict.fromkeys(terms):          # takrorsiz, tartib saqlanadi
+            tokens = gaz_tokens(term)
+            # «mobile», «orange» kabi nomlar – faqat gazetteer (shtat bilan) hal qiladi
+            if not tokens or " ".join(tokens) in GAZ_AMBIGUOUS:
+                continue
+            hit = gaz.resolve(term)
+            if hit is None:
+                continue
+            state = hit[0].rsplit(", ", 1)[1] if ", " in hit[0] else None
+            m.add(tokens, (hit[0], hit[1], hit[2], state))
+        return m
+
+    def add(self, tokens: list[str], value: tuple):
+        node = self.root
+        for tok in tokens:
+            node = node.setdefault(tok, {})
+        if self._END not in node:
+            self.size += 1
+        node[self._END] = value
+
+    def find(self, text: str) -> tuple[str, float, float] | None:
+        """Eng uzun (shahar > shtat) moslik: (kanonik nom, lat, lng) yoki None"""
+        tokens = gaz_tokens(text)
+        best, best_rank = None, None
+        i = 0
+        while i < len(tokens):
+            node, j, hit, n = self.root.get(tokens[i]), i, None, 0
+            while node is not None:
+                j += 1
+                if self._END in node:
+                    hit, n = node[self._END], j - i
+                node = node.get(tokens[j]) if j < len(tokens) else None
+            if hit is None:
+                i += 1
+                continue
+            city_state = hit[3]
+            qualifier, q_len = self.gaz._state_at(tokens, i + n)
+            if city_state and qualifier and qualifier != city_state:
+                return None                   # «Portland Maine» – gazetteer aniqlaydi
+            rank = (city_state is not None, n)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = hit, rank
+            i += n + q_len
+        return None if best is None else best[:3]
+
+
+CITY_MATCHER = CityMatcher.build(CITY_TERMS, GAZETTEER)
+
+
+# ---------- takroriy so'rovlar (chat bo'yicha oyna) ----------
+DUP_WINDOW = float(os.getenv("DUP_WINDOW_SEC", "600"))   # 0 → o'chirilgan
+DUP_MODE = os.getenv("DUP_MODE", "pointer")               # "pointer" – qisqa ishora, "skip" – jim
+DUP_POINTER = (
+    "☝️ Bu joy bo'yicha javob yuqorida.\n"
+    "☝️ Answered above.\n"
+    "☝️ Ответ выше."
 )
+# (chat, response_key) → javobning birinchi xabari; (chat, matn kaliti) → koordinatalar
+recent_answers = TTLCache(maxsize=5000, ttl=max(DUP_WINDOW, 1))
+recent_queries = TTLCache(maxsize=5000, ttl=max(DUP_WINDOW, 1))
+DUP_STATS = {"suppressed": 0, "text_hit": 0}
+
+
+def remember_answer(message: types.Message, query: str, lat: float, lng: float, sent: list):
+    if DUP_WINDOW <= 0 or not sent:
+        return
+    recent_answers.set((message.chat.id, response_key(lat, lng)), sent[0].message_id)
+    recent_queries.set((message.chat.id, geo_cache_key(query)), (lat, lng))
+
+
+async def suppress_duplicate(message: types.Message, lat: float, lng: float) -> bool:
+    """Shu chatda shu joyga DUP_WINDOW ichida javob berilgan bo'lsa – to'liq ro'yxat qayta yuborilmaydi"""
+    if DUP_WINDOW <= 0:
+        return False
+    answer_id = recent_answers.get((message.chat.id, response_key(lat, lng)))
+    if answer_id is None:
+        return False
+    DUP_STATS["suppressed"] += 1
+    if DUP_MODE == "pointer":
+        await reply_parts(message, [DUP_POINTER], reply_to_message_id=answer_id,
+                          allow_sending_without_reply=True)
+    return True
 
 
 
@@ -2921,88 +3120,490 @@ async def by_text(message: types.Message):
     if not raw or is_ad(raw):
         return
 
-    # Qora ro'yxat
-    blacklist = await get_blacklist()
-    if any(word in raw.lower() for word in blacklist):
+    # Qora ro'yxat (xotiradagi regex, DB ga bormaydi)
+    if is_blacklisted(raw):
         return
     
     # Faqat bema'ni matnlarni filtrlaymiz ("asdasd", "qwerty")
     if is_gibberish(raw):
         return
 
-    city_name = ""
-    
-    # 1) Avval AI bilan aniqlaymiz (har qanday shahar uchun)
-    city_name = await ai_extract_city(raw)
-    
-    # 2) Agar AI bo'sh qaytarsa, to'g'ridan-to'g'ri Geocoding ga urinib ko'ramiz
-    # Bu kichik shaharlar yoki o'zbekchada yozilgan shaharlar uchun
-    if not city_name:
-        # Matndan faqat potensial joylashuv so'zlarini ajratib olish
-        # (faqat harflardan iborat, raqam va belgilar emas)
-        potential_words = re.findall(r'\b[A-Za-z]{2,}(?:\s+[A-Za-z]{2,})?\b', raw)
-        
-        for word in potential_words:
-            if len(word) > 2:  # "LA", "NY" kabi qisqalar ham ishlashi mumkin
-                # Geocoding ga yuborib ko'ramiz
-                lat, lng = await geocode_with_retry(word)
-                if lat and lng:
-                    city_name = word
-                    break
-
-    if not city_name:
+    # 0) CITY_TERMS trie, keyin lokal gazetteer: mashhur shaharlar uchun AI va geocoder kerak emas
+    #    (shu chatda yaqinda javob berilgan matn – qayta aniqlanmaydi)
+    clean = strip_greeting(raw)
+    seen = recent_queries.get((message.chat.id, geo_cache_key(clean))) if DUP_WINDOW > 0 else None
+    if seen:
+        DUP_STATS["text_hit"] += 1
+        lat, lng = seen
+    else:
+        hit = CITY_MATCHER.find(clean) or GAZETTEER.resolve(clean)
+        if hit:
+            lat, lng = hit[1], hit[2]
+        else:
+            lat, lng = await resolve_city_online(raw)
+    if lat is None:
         return
 
-    # 3) Koordinatalarni olish (AI "Kansas City, Missouri, USA" deb qaytargan bo'lishi mumkin)
-    lat, lng = await geocode_with_retry(city_name)
-    if lat is None:
+    # Takroriy so'rov: ro'yxat o'rniga avvalgi javobga ishora
+    if await suppress_duplicate(message, lat, lng):
         return
 
-    # 4) 100 km radiusda restoranlar
-    found = [p for p in PLACES if haversine(lat, lng, p["lat"], p["lng"]) <= 100]
-    if not found:
+    # 4) 100 km radiusda restoranlar (tayyor javob keshdan)
+    chunks = render_places_near(lat, lng)
+    if not chunks:
         # Istasangiz, restoran topilmadi degan xabar qoldirish mumkin
         # await message.reply("📍 Bu joyda 100 km radiusda restoran topilmadi.")
         return
 
     # 5) Javob
-    out = "\n\n".join(get_display_text(p) for p in found)
-    for part in split_text(out):
-        await message.answer(
-            part,
-            reply_to_message_id=message.message_id,
-            disable_web_page_preview=True
-        )
+    sent = await reply_parts(message, chunks)
+    remember_answer(message, clean, lat, lng, sent)
+
+
+# ---------- 4b. nomzod n-grammalar (AI bo'sh qaytganda) ----------
+CAND_MAX = 6                                                    # geocoderga ko'pi bilan
+CAND_DEADLINE = float(os.getenv("CITY_CANDIDATE_DEADLINE", "4"))  # s, butun bosqich uchun
+CAND_STOPWORDS = {
+    "the", "and", "for", "with", "you", "your", "are", "any", "there", "here",
+    "where", "near", "around", "please", "need", "looking", "want", "good",
+    "best", "food", "halal", "restaurant", "restaurants", "cafe", "place",
+    "places", "shop", "store", "market", "city", "state", "usa", "america",
+    "salom", "assalomu", "alaykum", "rahmat", "iltimos", "qayerda", "bormi",
+    "bor", "yaqin", "atrofida", "restoran", "kafe", "joy", "shahar", "shtat",
+}
+CAND_CONTEXT = {"in", "near", "at", "around", "from", "to"}     # «in Plano», «near Frisco»
+
+
+def in_usa(lat: float, lng: float) -> bool:
+    """AQSh (Alyaska va Gavayi bilan) taxminiy chegaralari"""
+    return 18.0 <= lat <= 72.0 and -180.0 <= lng <= -65.0
+
+
+def city_candidates(raw: str, limit: int = CAND_MAX) -> list[tuple[float, str]]:
+    """
+    1–3 so'zli n-grammalar, takrorlarsiz, ehtimollik bo'yicha saralangan: (ball, so'rov).
+    Uzunlik uchun faqat bosh harfli yoki gazetteerdagi so'zlar hisoblanadi; chetida
+    to'ldiruvchi so'z bo'lgan n-gramma («men Bentonville») olinmaydi.
+    Bosh harf, oldidagi «in/near» va ortidagi shtat balni oshiradi.
+    """
+    words = re.findall(r"[A-Za-z][A-Za-z'.-]*", raw)
+    low = [w.casefold().strip("'.-") for w in words]
+    is_state = [
+        (len(w) == 2 and w.isupper() and l in GAZETTEER.states)
+        or (len(l) > 2 and l in GAZETTEER.states)
+        for w, l in zip(words, low)
+    ]
+
+    def state_after(k: int) -> str | None:
+        """k-so'zdan keyingi shtat: «Plano TX», «Frisco, Texas», «frisco tx» («in» emas)"""
+        if k + 1 >= len(words):
+            return None
+        nxt, nxt2 = words[k + 1], " ".join(low[k + 1:k + 3])
+        if len(nxt) == 2 and nxt.isupper():
+            return GAZETTEER.states.get(nxt.casefold())
+        if low[k + 1] in CAND_CONTEXT:
+            return None
+        return GAZETTEER.states.get(nxt2) or GAZETTEER.states.get(low[k + 1])
+
+    # ma'noli so'z: bosh harf, gazetteerda bor, shtat, «in …» dan keyin yoki shtatdan oldin
+    known = [
+        words[k][0].isupper() or low[k] in GAZETTEER.tokens or is_state[k]
+        or (k > 0 and low[k - 1] in CAND_CONTEXT) or state_after(k) is not None
+        for k in range(len(words))
+    ]
+    scored: dict[str, tuple[float, str]] = {}
+    for i in range(len(words)):
+        for n in (1, 2, 3):
+            if i + n > len(words):
+                break
+            gram = low[i:i + n]
+            if any(w in CAND_STOPWORDS for w in gram):
+                continue
+            if any(len(w) < 3 or w in CAND_CONTEXT for w in gram) and not (n == 1 and is_state[i]):
+                continue
+            if any(is_state[i + 1:i + n]):
+                continue                  # shtat – nomning qismi emas, qo'shimcha sifatida pastda
+            if not (known[i] and known[i + n - 1]):
+                continue                  # «dan ovqat kerak», «men Bentonville»
+            score = float(sum(known[i:i + n]))
+            score += 2 * sum(w[0].isupper() for w in words[i:i + n])
+            if i > 0 and low[i - 1] in CAND_CONTEXT:
+                score += 3
+            query = " ".join(words[i:i + n])
+            # ortidan shtat: «Plano TX», «Frisco, Texas»
+            state = state_after(i + n - 1)
+            if state:
+                score += 3
+                query = f"{query}, {state}"
+            key = geo_cache_key(query)
+            if key not in scored or scored[key][0] < score:
+                scored[key] = (score, query)
+    return sorted(scored.values(), key=lambda c: -c[0])[:limit]
+
+
+async def resolve_candidates(raw: str):
+    """
+    Nomzodlarni avval lokal indeksdan (gazetteer, geocode kesh), qolganini
+    parallel geocoderdan CAND_DEADLINE ichida topadi. Eng yuqori balli natija qaytadi.
+    """
+    candidates = city_candidates(raw)
+    if not candidates:
+        return None, None
+
+    found: list[tuple[float, float, float]] = []
+    unresolved: list[tuple[float, str]] = []
+    for score, query in candidates:
+        hit = GAZETTEER.resolve(query)
+        # «Bentonville, AR» → faqat shtat topilgan bo'lsa, bu nomzodni geocoder hal qiladi
+        if (hit and hit[0].casefold().startswith(gaz_tokens(query)[0])
+                and " ".join(gaz_tokens(query)) not in GAZ_AMBIGUOUS):
+            found.append((score, hit[1], hit[2]))
+            continue
+        cached = geo_cache.get(geo_cache_key(query), _MISSING)
+        if cached is not _MISSING:
+            if cached[0] is not None:
+                found.append((score, *cached))
+            continue
+        unresolved.append((score, query))
+
+    # lokal natijadan kuchsiz nomzodlarni geocoderga yubormaymiz
+    best_local = max((f[0] for f in found), default=None)
+    remote = {
+        asyncio.create_task(geocode_with_retry(query)): score
+        for score, query in unresolved
+        if best_local is None or score > best_local
+    }
+    if remote:
+        done, pending = await asyncio.wait(remote, timeout=CAND_DEADLINE)
+        for task in pending:
+            task.cancel()                 # upstream so'rov shield ostida keshni to'ldirib tugaydi
+        for task in done:
+            if task.exception() is None:
+                lat, lng = task.result()
+                if lat is not None and in_usa(lat, lng):
+                    found.append((remote[task], lat, lng))
+
+    if not found:
+        return None, None
+    _, lat, lng = max(found, key=lambda f: f[0])
+    return lat, lng
+
+
+async def resolve_city_online(raw: str):
+    """Gazetteer topa olmagan matn uchun NER / AI + geocoder: (lat, lng)"""
+    # 1) Lokal NER (spaCy) – arzon birinchi urinish; ingliz modeli o'zbekcha so'zlar va
+    #    ismlarni ham GPE deb belgilaydi, shuning uchun faqat geocodersiz topilgani olinadi
+    ner_city = await NER.extract(strip_greeting(raw))
+    if ner_city:
+        coords = await local_city_coords(ner_city)
+        if coords and in_usa(*coords):
+            return coords
+
+    # 2) AI bilan aniqlaymiz (har qanday shahar uchun)
+    city_name = await ai_extract_city(raw)
+
+    # 3) AI bo'sh qaytarsa – matndagi nomzod so'zlar (kichik shaharlar, o'zbekcha yozuv)
+    if not city_name:
+        return await resolve_candidates(raw)
+    return await city_coords(city_name)
+
+
+async def local_city_coords(city_name: str):
+    """Tarmoqdagi geocodersiz: gazetteer, so'ng geocode keshi (xotira, PostgreSQL); topilmasa None"""
+    hit = GAZETTEER.resolve(city_name)
+    if hit:
+        return hit[1], hit[2]
+    key = geo_cache_key(city_name)
+    coords = geo_cache.get(key)
+    if coords is None:
+        row = await geo_cache_db_get(key)
+        coords = row[0] if row else None
+    return coords if coords and coords[0] is not None else None
+
+
+async def city_coords(city_name: str):
+    """Koordinatalar: avval gazetteer («Kansas City, Missouri, USA» ham), keyin geocoder"""
+    hit = GAZETTEER.resolve(city_name)
+    if hit:
+        return hit[1], hit[2]
+    return await geocode_with_retry(city_name)
+
+
+
+# ---------------- replikalararo sinxronlash (LISTEN/NOTIFY) ----------------
+NOTIFY_CHANNELS = ("places_changed", "blacklist_changed")
+_notify_queue: asyncio.Queue = asyncio.Queue()
+
+
+def on_db_notify(conn, pid: int, channel: str, payload: str):
+    # xabar «muallif:amal:kalit»; o'zimiz yozgan o'zgarishlar xotirada allaqachon qo'llangan
+    origin, _, change = payload.partition(":")
+    if origin == PROCESS_TAG:
+        return
+    _notify_queue.put_nowait((channel, change))
+
+
+async def apply_place_change(op: str, place_id: int):
+    """Boshqa replika o'zgartirgan qatorni PLACES, indeks va javob keshiga qo'llash"""
+    row = None
+    if op != "DELETE":
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM places WHERE id = $1", place_id)
+    if row is not None:
+        patch_place_in_memory(row)
+        return
+    place = PLACES.remove(place_id)
+    if place is not None:
+        PLACE_INDEX.remove(place_id)
+        invalidate_responses_near(place.lat, place.lng)
 
 
+def apply_blacklist_change(op: str, word: str):
+    if op == "DELETE":
+        rebuild_blacklist_matcher(BLACKLIST - {word})
+    else:
+        rebuild_blacklist_matcher(BLACKLIST | {word})
+
+
+async def resync_from_db():
+    """Ulanish uzilganda xabarlar yo'qolgan bo'lishi mumkin – hammasini qayta yuklash"""
+    PLACES.load(await load_places_from_db() or [])
+    PLACE_INDEX.rebuild(PLACES)
+    response_cache.clear()
+    recent_answers.clear()
+    rebuild_blacklist_matcher(await get_blacklist())
+
+
+async def apply_notifications():
+    """Xabarlarni kelgan tartibida bittadan qo'llaydi"""
+    while True:
+        channel, payload = await _notify_queue.get()
+        op, _, key = payload.partition(":")
+        try:
+            if channel == "places_changed":
+                await apply_place_change(op, int(key))
+            else:
+                apply_blacklist_change(op, key)
+        except Exception as e:
+            print(f"NOTIFY ({channel} {payload}) xatosi: {e}")
+
+
+async def listen_db_changes(reconnect_delay: float = 5.0):
+    """
+    Alohida ulanishda LISTEN, so'ng to'liq sinxronlash: boshlang'ich yuklash bilan
+    LISTEN orasida (yoki uzilish paytida) kelgan o'zgarishlar ham qo'llanadi.
+    """
+    applier = asyncio.create_task(apply_notifications())
+    try:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(DATABASE_URL)
+                for channel in NOTIFY_CHANNELS:
+                    await conn.add_listener(channel, on_db_notify)
+                await resync_from_db()
+                while not conn.is_closed():
+                    await asyncio.sleep(reconnect_delay)
+                    await conn.execute("SELECT 1")        # uzilishni aniqlash
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"LISTEN ulanishi xatosi: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(reconnect_delay)
+    finally:
+        applier.cancel()
+
+
+# ---------------- webhook va worker protsesslar ----------------
+import signal
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def worker_port(idx: int) -> int:
+    return WEBHOOK_PORT + 1 + idx
+
+
+def update_chat_id(update: dict) -> int:
+    """Update qaysi chatga tegishli (bir chat doim bitta worker'ga tushadi – FSM va tartib saqlanadi)"""
+    for event in update.values():
+        if not isinstance(event, dict):
+            continue
+        chat = (event.get("chat") or (event.get("message") or {}).get("chat")
+                or event.get("from") or event.get("user"))
+        if chat:
+            return chat["id"]
+    return 0
+
+
+def cancel_on_sigterm():
+    """SIGTERM → joriy vazifa bekor qilinadi, finally bloklari ishlaydi"""
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+
+async def set_bot_webhook():
+    await bot.set_webhook(
+        WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=True,
+    )
+
+
+async def serve_webhook(host: str, port: int, set_hook: bool):
+    """Update'larni aiogram orqali qabul qiluvchi aiohttp server (to'xtatilguncha ishlaydi)"""
+    app = web.Application()
+    # Telegram'ga darhol 200, update fonda qayta ishlanadi (sekin handler qayta yuborishga olib kelmaydi)
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET,
+                         handle_in_background=True).register(app, path=WEBHOOK_PATH)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    if set_hook:
+        await set_bot_webhook()
+    print(f"Webhook: {host}:{port}{WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+_forward_session: aiohttp.ClientSession | None = None
+
+
+def forward_session() -> aiohttp.ClientSession:
+    """Frontend → worker'lar: alohida sessiya, ulanishlar soni cheklanmagan (HTTP.session dan farqli)"""
+    global _forward_session
+    if _forward_session is None or _forward_session.closed:
+        _forward_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), trust_env=False)
+    return _forward_session
+
+
+async def close_forward_session():
+    if _forward_session is not None and not _forward_session.closed:
+        await _forward_session.close()
+
+
+async def route_update(request: web.Request) -> web.Response:
+    """
+    Frontend: update'ni chat id bo'yicha worker'ga uzatadi. Worker uni qabul qilishi
+    bilan 200 qaytaradi (handle_in_background), shuning uchun javob handler'ni kutmaydi.
+    """
+    if WEBHOOK_SECRET and request.headers.get(SECRET_HEADER) != WEBHOOK_SECRET:
+        return web.Response(status=401)
+    body = await request.read()
+    try:
+        idx = update_chat_id(json.loads(body)) % WEB_WORKERS
+    except (ValueError, TypeError, KeyError):
+        return web.Response(status=400)
+    headers = {"Content-Type": "application/json"}
+    if WEBHOOK_SECRET:
+        headers[SECRET_HEADER] = WEBHOOK_SECRET
+    try:
+        async with HTTP.track("webhook"):
+            async with forward_session().post(f"http://127.0.0.1:{worker_port(idx)}{WEBHOOK_PATH}",
+                                              data=body, headers=headers,
+                                              timeout=HTTP.timeout("webhook")) as resp:
+                return web.Response(status=resp.status)
+    except Exception as e:
+        print(f"Webhook worker {idx} xatosi: {e}")
+        return web.Response(status=503)          # Telegram keyinroq qayta yuboradi
+
+
+async def supervise_worker(idx: int):
+    """Worker protsessini ishga tushiradi va to'xtab qolsa qayta ko'taradi"""
+    env = {**os.environ, "BOT_WORKER": str(idx)}
+    while True:
+        proc = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), env=env)
+        try:
+            code = await proc.wait()
+        except asyncio.CancelledError:
+            proc.terminate()
+            await proc.wait()
+            raise
+        print(f"Worker {idx} to'xtadi (kod {code}), qayta ishga tushiriladi")
+        await asyncio.sleep(2)
+
+
+async def run_webhook_front():
+    """
+    Ko'p protsessli rejim: bu protsess faqat portni tinglaydi va update'larni
+    WEB_WORKERS ta worker'ga yo'naltiradi. Worker'lar faqat Postgres'ni bo'lishadi.
+    """
+    cancel_on_sigterm()
+    workers = [asyncio.create_task(supervise_worker(i)) for i in range(WEB_WORKERS)]
+    await HTTP.start()
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, route_update)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        await set_bot_webhook()
+        print(f"Webhook frontend: {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} → {WEB_WORKERS} worker")
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await runner.cleanup()
+        await close_forward_session()
+        await close_http()
+        await bot.session.close()
+
 
 # ---------------- run ----------------
 async def main():
     global PLACES, db_pool
-    
-    # DB ulanish
+
+    if BOT_MODE == "webhook" and WEB_WORKERS > 1 and BOT_WORKER is None:
+        await run_webhook_front()
+        return
+
+    NER.start()                          # spaCy modellari worker'larda fonda yuklanadi
+
+    # DB va tashqi HTTP ulanishlari
     await init_db()
+    await HTTP.start()
+    listener = fsm_cleanup = None
     
     try:
-        PLACES = await load_places_from_db()
-        
-        # Agar bo'sh bo'lsa, initial ma'lumotlarni qo'shish
-        if not PLACES:
-            for p in initial_places:
-                await add_place_to_db(
-                    p["name"], p["lat"], p["lng"],
-                    p["text"], p["text"]
-                )
-            PLACES = await load_places_from_db()
+        rows = await load_places()         # bo'sh bo'lsa, initial ma'lumotlar bilan to'ldiriladi
         
-        # PLACES formatini moslashtirish (id kalitini qo'shish)
-        for i, place in enumerate(PLACES):
-            if 'id' not in place:
-                place['id'] = i + 1  # Yoki DB dan qayta yuklash
+        PLACES.load(rows or [])
+        PLACE_INDEX.rebuild(PLACES)
+        rebuild_blacklist_matcher(await get_blacklist())
+        listener = asyncio.create_task(listen_db_changes())
+        fsm_cleanup = asyncio.create_task(cleanup_fsm_states())
+        print(f"Bot tayyor: {(time.perf_counter() - STARTUP_T0) * 1000:.0f} ms "
+              f"({len(PLACES)} joy, {len(BLACKLIST)} qora so'z)")
         
-        await dp.start_polling(bot, skip_updates=True)
+        if BOT_MODE != "webhook":
+            await dp.start_polling(bot, skip_updates=True)
+        elif BOT_WORKER is not None:
+            cancel_on_sigterm()
+            await serve_webhook("127.0.0.1", worker_port(int(BOT_WORKER)), set_hook=False)
+        else:
+            cancel_on_sigterm()
+            await serve_webhook(WEBHOOK_HOST, WEBHOOK_PORT, set_hook=True)
     finally:
+        for task in (listener, fsm_cleanup):
+            if task is not None:
+                task.cancel()
+        await NER.stop()
+        await SEND.close()
+        report_stats("Geocode kesh", GEO_CACHE_STATS)
+        report_stats("AI kesh", AI_CACHE_STATS)
+        report_stats("Takroriy so'rovlar", DUP_STATS)
+        await close_http()
         await close_db()
+        if BOT_MODE == "webhook":
+            await bot.session.close()
 
 
 
@@ -0,0 +1,230 @@
+"""
+Lokal benchmarklar (tarmoq, PostgreSQL va Telegram kerak emas).
+
+    python bench.py distance
+    python bench.py matcher
+    python bench.py webhook      # lokal soxta Telegram Bot API bilan
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+
+os.environ.setdefault("BOT_TOKEN", "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ.setdefault("CHANNEL_ID", "0")
+os.environ.setdefault("ADMIN_ID", "0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import app
+
+
+def timeit(fn, repeat: int) -> float:
+    """Eng yaxshi natija, ms da"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def synthetic_places(n: int, seed: int = 42) -> list[dict]:
+    rnd = random.Random(seed)
+    return [
+        {"id": i + 1, "lat": rnd.uniform(25.0, 49.0), "lng": rnd.uniform(-124.0, -67.0)}
+        for i in range(n)
+    ]
+
+
+def bench_distance():
+    """Eski list comprehension vs vektorlashgan masofa vs grid + vektor"""
+    lat, lng = 39.0997, -94.5786          # Kansas City
+    print(f"{'joylar':>10} {'list comp':>12} {'numpy':>12} {'grid+numpy':>12} {'topildi':>8}")
+    for n in (100, 10_000, 1_000_000):
+        places = synthetic_places(n)
+        index = app.PlaceIndex()
+        index.rebuild(places)
+        repeat = 3 if n >= 1_000_000 else 20
+
+        old = timeit(lambda: [p for p in places if app.haversine(lat, lng, p["lat"], p["lng"]) <= 100], repeat)
+        vec = timeit(lambda: index.distances(lat, lng), repeat)
+        grid = timeit(lambda: index.within_radius(lat, lng, 100), repeat)
+        found = len(index.within_radius(lat, lng, 100))
+        print(f"{n:>10} {old:>10.3f}ms {vec:>10.3f}ms {grid:>10.3f}ms {found:>8}")
+
+
+SAMPLE_MESSAGES = [
+    "Assalomu alaykum, Chicago da halal restoran bormi?",
+    "Salom, Kansas City MO atrofida osh qayerda bor",
+    "any halal food near st louis mo please",
+    "Привет, есть халяль кафе в Далласе?",
+    "Aurora IL",
+    "Bugun havo juda yaxshi, hammaga salom",
+    "Looking for plov in Fort Lauderdale, Florida",
+    "Denverga kim boradi, yo'lda ovqatlanadigan joy kerak",
+]
+
+
+def synthetic_messages(n: int, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    return [rnd.choice(SAMPLE_MESSAGES) for _ in range(n)]
+
+
+def bench_matcher():
+    """Eski CITY_PAT alternation regex vs token-trie vs to'liq gazetteer (xabar/s)"""
+    city_pat = re.compile(r"\b(" + "|".join(app.CITY_TERMS) + r")\b", flags=re.I)
+    messages = synthetic_messages(20_000)
+    print(f"atamalar: {len(app.CITY_TERMS)}, trie'da: {app.CITY_MATCHER.size}")
+    print(f"{'usul':>12} {'vaqt':>10} {'xabar/s':>12} {'topildi':>8}")
+    for name, fn in (
+        ("CITY_PAT", city_pat.search),
+        ("trie", app.CITY_MATCHER.find),
+        ("gazetteer", app.GAZETTEER.resolve),
+    ):
+        ms = timeit(lambda: [fn(m) for m in messages], 3)
+        found = sum(fn(m) is not None for m in messages)
+        print(f"{name:>12} {ms:>8.1f}ms {len(messages) / ms * 1000:>12,.0f} {found:>8}")
+
+
+async def fake_telegram(port: int, calls: list):
+    """Bot API o'rnida: har bir metod chaqiruvini yozib, muvaffaqiyatli javob qaytaradi"""
+    from aiohttp import web
+
+    async def handle(request):
+        data = dict(await request.post()) if request.content_type != "application/json" else await request.json()
+        calls.append((request.match_info["method"], data))
+        result = True
+        if request.match_info["method"].startswith("send"):
+            result = {"message_id": len(calls), "date": 0, "text": data.get("text", ""),
+                      "chat": {"id": int(data["chat_id"]), "type": "private"}}
+        return web.json_response({"ok": True, "result": result})
+
+    web_app = web.Application()
+    web_app.router.add_post("/bot{token}/{method}", handle)
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def serve(web_app, port: int):
+    from aiohttp import web
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def text_update(update_id: int, chat_id: int, text: str) -> dict:
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": text,
+        "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+        "from": {"id": abs(chat_id), "is_bot": False, "first_name": "bench"},
+    }}
+
+
+async def webhook_run(workers: int = 4, chats: int = 200, updates: int = 5000):
+    from aiohttp import web
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    app.WEBHOOK_PORT, app.WEB_WORKERS, app.WEBHOOK_SECRET = 18080, workers, "bench-secret"
+    tg_port = 18180
+    calls: list = []
+    runners = [await fake_telegram(tg_port, calls)]
+    await app.bot.session.close()
+    app.bot.session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{tg_port}"))
+    await app.HTTP.start()
+
+    # 1) frontend → worker'lar: har bir chat doim bitta worker'ga tushadimi
+    seen: dict[int, set[int]] = {}
+
+    def recorder(idx):
+        async def handle(request):
+            if request.headers.get(app.SECRET_HEADER) != app.WEBHOOK_SECRET:
+                return web.Response(status=401)
+            update = json.loads(await request.read())
+            seen.setdefault(app.update_chat_id(update), set()).add(idx)
+            return web.Response()
+        return handle
+
+    for idx in range(workers):
+        worker_app = web.Application()
+        worker_app.router.add_post(app.WEBHOOK_PATH, recorder(idx))
+        runners.append(await serve(worker_app, app.worker_port(idx)))
+    front = web.Application()
+    front.router.add_post(app.WEBHOOK_PATH, app.route_update)
+    runners.append(await serve(front, app.WEBHOOK_PORT))
+
+    url = f"http://127.0.0.1:{app.WEBHOOK_PORT}{app.WEBHOOK_PATH}"
+    headers = {app.SECRET_HEADER: app.WEBHOOK_SECRET}
+    rnd = random.Random(3)
+    chat_ids = [rnd.choice((1, -1)) * rnd.randint(10_000, 10**10) for _ in range(chats)]
+    session = app.HTTP.session
+    t0 = time.perf_counter()
+    sem = asyncio.Semaphore(64)
+
+    async def post(i):
+        async with sem:
+            async with session.post(url, json=text_update(i, rnd.choice(chat_ids), "Chicago"),
+                                    headers=headers) as resp:
+                return resp.status
+
+    statuses = await asyncio.gather(*(post(i) for i in range(updates)))
+    elapsed = time.perf_counter() - t0
+    async with session.post(url, json=text_update(0, 1, "x")) as resp:
+        unauthorized = resp.status
+    routed_ok = all(len(w) == 1 and next(iter(w)) == chat % workers for chat, w in seen.items())
+    print(f"worker'lar: {workers}, chatlar: {len(seen)}, update'lar: {updates}")
+    print(f"frontend: {updates / elapsed:,.0f} update/s, 200: {statuses.count(200)}, "
+          f"secret'siz: {unauthorized}, marshrut barqaror: {routed_ok}")
+
+    # 2) bitta haqiqiy worker (dispatcher + handler) → soxta Telegram
+    for runner in runners[1:]:
+        await runner.cleanup()
+    app.WEB_WORKERS = 1
+    front = web.Application()
+    front.router.add_post(app.WEBHOOK_PATH, app.route_update)
+    front_runner = await serve(front, app.WEBHOOK_PORT)
+    worker = asyncio.create_task(app.serve_webhook("127.0.0.1", app.worker_port(0), set_hook=False))
+    await asyncio.sleep(0.2)
+    await app.set_bot_webhook()
+    async with session.post(url, json=text_update(1, 777, "/start"), headers=headers) as resp:
+        status = resp.status
+    for _ in range(50):
+        if any(m == "sendMessage" for m, _ in calls):
+            break
+        await asyncio.sleep(0.05)
+    methods = [m for m, _ in calls]
+    replied = [d for m, d in calls if m == "sendMessage" and str(d["chat_id"]) == "777"]
+    print(f"end-to-end: {status}, Bot API chaqiruvlari: {methods}, /start javobi: {bool(replied)}")
+
+    worker.cancel()
+    await asyncio.gather(worker, return_exceptions=True)
+    await front_runner.cleanup()
+    await runners[0].cleanup()
+    await app.close_forward_session()
+    await app.HTTP.close()
+    await app.bot.session.close()
+
+
+def bench_webhook():
+    """Webhook frontend: chat bo'yicha marshrut, o'tkazuvchanlik va soxta Telegram bilan to'liq yo'l"""
+    asyncio.run(webhook_run())
+
+
+BENCHES = {
+    "distance": bench_distance,
+    "matcher": bench_matcher,
+    "webhook": bench_webhook,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHES)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHES[name]()
@@ -0,0 +1,53 @@
+"""
+spaCy NER – alohida protsesslarda ishlaydi (app.py ning ProcessPoolExecutor'i).
+Bu modul bot konfiguratsiyasiga bog'liq emas: worker faqat shu faylni import qiladi.
+"""
+import threading
+import time
+
+SPACY_MODELS = {"en": "en_core_web_sm", "ru": "ru_core_news_sm"}
+# NER uchun kerak bo'lmagan komponentlar – yuklanmaydi
+SPACY_EXCLUDE = ["tagger", "parser", "lemmatizer", "attribute_ruler", "morphologizer", "senter"]
+NER_LABELS = {"GPE", "LOC"}
+
+_nlp: dict[str, object] = {}              # til → yuklangan model (yoki None – topilmadi)
+_nlp_lock = threading.Lock()
+
+
+def nlp_model(lang: str):
+    """Til modeli: birinchi chaqiruvda yuklanadi, topilmasa None (yuklab olinmaydi)"""
+    lang = lang if lang in SPACY_MODELS else "en"
+    if lang in _nlp:
+        return _nlp[lang]
+    with _nlp_lock:
+        if lang not in _nlp:
+            t0 = time.perf_counter()
+            try:
+                import spacy
+                _nlp[lang] = spacy.load(SPACY_MODELS[lang], exclude=SPACY_EXCLUDE)
+                print(f"spaCy {SPACY_MODELS[lang]}: {(time.perf_counter() - t0) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"spaCy {SPACY_MODELS[lang]} yuklash xatosi: {e}")
+                _nlp[lang] = None
+    return _nlp[lang]
+
+
+def warm():
+    """Worker initializer: modellarni oldindan yuklaydi"""
+    for lang in SPACY_MODELS:
+        nlp_model(lang)
+
+
+def first_place(doc) -> str:
+    for ent in doc.ents:
+        if ent.label_ in NER_LABELS:
+            return ent.text
+    return ""
+
+
+def extract_batch(lang: str, texts: list[str]) -> list[str]:
+    """Bir tildagi matnlar to'plami – nlp.pipe orqali; har biri uchun birinchi GPE/LOC yoki ''"""
+    nlp = nlp_model(lang)
+    if nlp is None:
+        return [""] * len(texts)
+    return [first_place(doc) for doc in nlp.pipe(texts, batch_size=len(texts))]